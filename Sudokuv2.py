@@ -1,68 +1,1182 @@
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
 import tkinter as tk
+from functools import lru_cache, partial
+from itertools import permutations
+from multiprocessing import Pool
 from tkinter import messagebox
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # the bulk solver is optional
+    np = None
+
+class Geometry:
+    """Cell layout of a board with k x k boxes and digits 1..k^2.
+
+    Digit d is stored as bit (d - 1) in the row/column/box masks, and units
+    are (kind, index, cells) where kind selects a solver's rows, cols or
+    boxes mask list.
+    """
+
+    def __init__(self, box_size: int):
+        k = box_size
+        n = k * k
+        self.box_size = k
+        self.size = n
+        self.box_of = [[k * (r // k) + c // k for c in range(n)] for r in range(n)]
+        self.all_digits = (1 << n) - 1
+        self.units = (
+            [(0, r, [(r, c) for c in range(n)]) for r in range(n)]
+            + [(1, c, [(r, c) for r in range(n)]) for c in range(n)]
+            + [(2, b, [(k * (b // k) + i, k * (b % k) + j) for i in range(k) for j in range(k)]) for b in range(n)]
+        )
+        if n <= 16:
+            self.bit_count = [bin(m).count("1") for m in range(self.all_digits + 1)].__getitem__
+        else:
+            self.bit_count = lambda mask: bin(mask).count("1")
+
+@lru_cache(maxsize=None)
+def geometry(box_size: int) -> Geometry:
+    return Geometry(box_size)
+
+def board_geometry(board) -> Geometry:
+    size = len(board)
+    box_size = math.isqrt(size)
+    if size == 0 or box_size * box_size != size or any(len(row) != size for row in board):
+        raise ValueError(f"Board must be k^2 x k^2, got {size} rows")
+    return geometry(box_size)
+
+# The classic 9x9 layout, used by the bulk solver
+ALL_DIGITS = geometry(3).all_digits
+UNITS = geometry(3).units
+
+# Characters for digits 1..25 in puzzle strings; 0 or . is an empty cell
+DIGIT_CHARS = "123456789ABCDEFGHIJKLMNOP"
+
+# Board sizes offered by SudokuApp, mapped to their box size
+BOARD_SIZES = {"9x9": 3, "16x16": 4, "25x25": 5}
+
+# "naive" fills cells in row-major order; "mrv" branches on the cell with the
+# fewest candidates and propagates naked/hidden singles after each placement;
+# "dlx" solves the exact-cover formulation with Dancing Links.
+STRATEGIES = ("naive", "mrv", "dlx")
 
 class SudokuSolver:
-    def __init__(self, board):
+    def __init__(self, board, strategy: str = "naive"):
+        if strategy not in ("naive", "mrv"):
+            raise ValueError(f"Unknown strategy {strategy!r}, expected 'naive' or 'mrv'")
         self.board = board
+        self.strategy = strategy
+        self.geometry = geo = board_geometry(board)
+        self.size = n = geo.size
+        self.box_of = geo.box_of
+        self.all_digits = geo.all_digits
+        self.rows = [0] * n
+        self.cols = [0] * n
+        self.boxes = [0] * n
+        self.empty_cells = []
+        self.consistent = True
+        self.solved = False
+        # Set from another thread to abandon a running solve()
+        self.cancelled = False
+
+        # Search statistics: guesses made and guesses undone
+        self.nodes = 0
+        self.backtracks = 0
+        # Cells placed by the mrv search, in order, so a failed branch can be undone
+        self.trail = []
+
+        for r in range(n):
+            for c in range(n):
+                num = board[r][c]
+                if num == 0:
+                    self.empty_cells.append((r, c))
+                elif 1 <= num <= n and self.is_valid(r, c, num):
+                    self.place(r, c, num)
+                else:
+                    # Duplicate or out-of-range given: the puzzle has no solution
+                    self.consistent = False
+
+    def candidates(self, row: int, col: int) -> int:
+        return ~(self.rows[row] | self.cols[col] | self.boxes[self.box_of[row][col]]) & self.all_digits
 
     def is_valid(self, row: int, col: int, num: int) -> bool:
-        for i in range(9):
-            if self.board[row][i] == num or self.board[i][col] == num:
-                return False
-
-        start_row, start_col = 3 * (row // 3), 3 * (col // 3)
-        for i in range(3):
-            for j in range(3):
-                if self.board[start_row + i][start_col + j] == num:
-                    return False
-        return True
+        return bool(self.candidates(row, col) & (1 << (num - 1)))
+
+    def place(self, row: int, col: int, num: int):
+        bit = 1 << (num - 1)
+        self.board[row][col] = num
+        self.rows[row] |= bit
+        self.cols[col] |= bit
+        self.boxes[self.box_of[row][col]] |= bit
+
+    def unplace(self, row: int, col: int):
+        bit = ~(1 << (self.board[row][col] - 1))
+        self.board[row][col] = 0
+        self.rows[row] &= bit
+        self.cols[col] &= bit
+        self.boxes[self.box_of[row][col]] &= bit
 
     def find_empty_cell(self):
-        for r in range(9):
-            for c in range(9):
-                if self.board[r][c] == 0:
-                    return r, c
+        for r, c in self.empty_cells:
+            if self.board[r][c] == 0:
+                return r, c
         return None
 
-    def solve_generator(self):
-        empty = self.find_empty_cell()
-        if not empty:
-            yield (self.board, None, True)
+    def cancel(self):
+        self.cancelled = True
+
+    def solve(self) -> bool:
+        if not self.consistent:
+            return False
+        if self.strategy == "mrv":
+            self.solved = self._solve_mrv()
+        else:
+            self.solved = self._solve_from(0)
+        return self.solved
+
+    def _solve_from(self, depth: int) -> bool:
+        # Cells are filled in row-major order, so the next empty cell is
+        # always empty_cells[depth]; no rescan of the board is needed.
+        if depth == len(self.empty_cells):
+            return True
+        row, col = self.empty_cells[depth]
+        box = self.box_of[row][col]
+        rows, cols, boxes = self.rows, self.cols, self.boxes
+
+        free = ~(rows[row] | cols[col] | boxes[box]) & self.all_digits
+        while free and not self.cancelled:
+            bit = free & -free
+            free ^= bit
+            self.nodes += 1
+            self.board[row][col] = bit.bit_length()
+            rows[row] |= bit
+            cols[col] |= bit
+            boxes[box] |= bit
+            if self._solve_from(depth + 1):
+                return True
+            rows[row] ^= bit
+            cols[col] ^= bit
+            boxes[box] ^= bit
+            self.backtracks += 1
+        self.board[row][col] = 0
+        return False
+
+    def _assign(self, row: int, col: int, num: int):
+        self.place(row, col, num)
+        self.trail.append((row, col))
+
+    def _undo(self, mark: int):
+        while len(self.trail) > mark:
+            self.unplace(*self.trail.pop())
+
+    def _propagate(self, hidden_singles: bool = True) -> bool:
+        """Place naked (and, unless disabled, hidden) singles until none are left.
+
+        Returns False if a contradiction is found; the caller undoes the trail.
+        """
+        board, trail, box_of = self.board, self.trail, self.box_of
+        rows, cols, boxes = self.rows, self.cols, self.boxes
+        all_digits = self.all_digits
+        masks = (rows, cols, boxes)
+        while True:
+            # Naked singles first, to a fixpoint, since they are the cheaper scan
+            changed = True
+            while changed:
+                changed = False
+                for row, col in self.empty_cells:
+                    if board[row][col]:
+                        continue
+                    box = box_of[row][col]
+                    free = ~(rows[row] | cols[col] | boxes[box]) & all_digits
+                    if not free:
+                        return False
+                    if not free & (free - 1):
+                        board[row][col] = free.bit_length()
+                        rows[row] |= free
+                        cols[col] |= free
+                        boxes[box] |= free
+                        trail.append((row, col))
+                        changed = True
+            if not hidden_singles:
+                return True
+
+            found = False
+            for kind, index, cells in self.geometry.units:
+                placed = masks[kind][index]
+                if placed == all_digits:
+                    continue
+                once = twice = 0
+                for row, col in cells:
+                    if not board[row][col]:
+                        free = ~(rows[row] | cols[col] | boxes[box_of[row][col]]) & all_digits
+                        twice |= once & free
+                        once |= free
+                if (once | placed) != all_digits:
+                    # Some missing digit has nowhere left to go in this unit
+                    return False
+                hidden = once & ~twice
+                while hidden:
+                    bit = hidden & -hidden
+                    hidden ^= bit
+                    for row, col in cells:
+                        if not board[row][col] and self.candidates(row, col) & bit:
+                            self._assign(row, col, bit.bit_length())
+                            found = True
+                            break
+                    else:
+                        # The only cell for this digit was just taken by another single
+                        return False
+            if not found:
+                return True
+
+    def _most_constrained_cell(self):
+        board, box_of = self.board, self.box_of
+        rows, cols, boxes = self.rows, self.cols, self.boxes
+        all_digits, bit_count = self.all_digits, self.geometry.bit_count
+        best, best_count = None, self.size + 1
+        for row, col in self.empty_cells:
+            if not board[row][col]:
+                count = bit_count(~(rows[row] | cols[col] | boxes[box_of[row][col]]) & all_digits)
+                if count < best_count:
+                    best, best_count = (row, col), count
+                    if count <= 2:
+                        break
+        return best
+
+    def _solve_mrv(self) -> bool:
+        if not self._propagate():
+            return False
+        cell = self._most_constrained_cell()
+        if cell is None:
+            return True
+        row, col = cell
+
+        free = self.candidates(row, col)
+        while free and not self.cancelled:
+            bit = free & -free
+            free ^= bit
+            mark = len(self.trail)
+            self.nodes += 1
+            self._assign(row, col, bit.bit_length())
+            if self._solve_mrv():
+                return True
+            self._undo(mark)
+            self.backtracks += 1
+        return False
+
+    def count_solutions(self, limit: Optional[int] = None) -> int:
+        """Count solutions with the mrv search, stopping once limit are found.
+
+        The board is left as it was. Uniqueness is count_solutions(2) == 1.
+        """
+        if not self.consistent:
+            return 0
+        self._found = 0
+        self._count_mrv(limit)
+        return self._found
+
+    def _count_mrv(self, limit: Optional[int]) -> bool:
+        # Returns True once limit solutions have been found. Every call undoes
+        # its own placements before returning.
+        mark = len(self.trail)
+        if not self._propagate():
+            self._undo(mark)
+            return False
+        cell = self._most_constrained_cell()
+        if cell is None:
+            self._found += 1
+            self._undo(mark)
+            return limit is not None and self._found >= limit
+        row, col = cell
+
+        free = self.candidates(row, col)
+        while free and not self.cancelled:
+            bit = free & -free
+            free ^= bit
+            self.nodes += 1
+            self._assign(row, col, bit.bit_length())
+            if self._count_mrv(limit):
+                self._undo(mark)
+                return True
+            self.trail.pop()
+            self.unplace(row, col)
+            self.backtracks += 1
+        self._undo(mark)
+        return False
+
+    def solve_generator(self, diffs: bool = False):
+        """Step through the search for animation.
+
+        Yields (board, (row, col), solved) after every placement or removal,
+        ending with (board, None, solved). With diffs, yields only the
+        (row, col, old, new) change of each step; check self.solved afterwards.
+        """
+        steps = self._steps_mrv() if self.strategy == "mrv" else self._steps_naive()
+        if not self.consistent:
+            steps = iter(())
+        if diffs:
+            yield from steps
+            return
+        for row, col, _, _ in steps:
+            yield (self.board, (row, col), False)
+        yield (self.board, None, self.solved)
+
+    def _steps_naive(self):
+        # Explicit-stack version of _solve_from: remaining[depth] holds the
+        # digits not yet tried in empty_cells[depth].
+        cells = self.empty_cells
+        if not cells:
+            self.solved = True
             return
-        row, col = empty
-
-        for num in range(1, 10):
-            if self.is_valid(row, col, num):
-                self.board[row][col] = num
-                yield (self.board, (row, col), False)
-                for result in self.solve_generator():
-                    yield result
-                    if result[2]:
+        board = self.board
+        remaining = [0] * len(cells)
+        depth, fresh = 0, True
+        while depth >= 0:
+            row, col = cells[depth]
+            if fresh:
+                remaining[depth] = self.candidates(row, col)
+            else:
+                old = board[row][col]
+                self.unplace(row, col)
+                self.backtracks += 1
+                yield (row, col, old, 0)
+
+            free = remaining[depth]
+            if not free:
+                depth, fresh = depth - 1, False
+                continue
+            bit = free & -free
+            remaining[depth] = free ^ bit
+            self.nodes += 1
+            self.place(row, col, bit.bit_length())
+            yield (row, col, 0, board[row][col])
+            if depth + 1 == len(cells):
+                self.solved = True
+                return
+            depth, fresh = depth + 1, True
+
+    def _steps_mrv(self):
+        # Explicit-stack version of _solve_mrv. Each frame is
+        # [row, col, untried digits, trail length before the guess], so
+        # undoing to the mark removes the guess and everything it propagated.
+        board, trail = self.board, self.trail
+        stack = []
+        descend = True
+        while True:
+            if descend:
+                mark = len(trail)
+                consistent = self._propagate()
+                for row, col in trail[mark:]:
+                    yield (row, col, 0, board[row][col])
+                if consistent:
+                    cell = self._most_constrained_cell()
+                    if cell is None:
+                        self.solved = True
                         return
-                self.board[row][col] = 0
-                yield (self.board, (row, col), False)
-        yield (self.board, None, False)
+                    row, col = cell
+                    stack.append([row, col, self.candidates(row, col), len(trail)])
+
+            descend = False
+            while stack:
+                frame = stack[-1]
+                row, col, free, mark = frame
+                if len(trail) > mark:
+                    self.backtracks += 1
+                    while len(trail) > mark:
+                        r, c = trail.pop()
+                        old = board[r][c]
+                        self.unplace(r, c)
+                        yield (r, c, old, 0)
+                if free:
+                    bit = free & -free
+                    frame[2] = free ^ bit
+                    self.nodes += 1
+                    self._assign(row, col, bit.bit_length())
+                    yield (row, col, 0, board[row][col])
+                    descend = True
+                    break
+                stack.pop()
+            if not descend:
+                return
+
+class DLXSolver:
+    """Exact-cover Sudoku solver using Knuth's Algorithm X with Dancing Links.
+
+    For an n x n board each of the n^3 (row, col, digit) placements is a
+    matrix row covering four of 4n^2 columns: the cell, and the digit in its
+    row, column and box (729 rows and 324 columns for 9x9). Nodes live in
+    parallel lists rather than objects to keep the links cheap.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.geometry = board_geometry(board)
+        self.size = self.geometry.size
+        self.givens = [row[:] for row in board]
+        self.consistent = True
+        self.solved = False
+        self.cancelled = False
+        self.nodes = 0
+        self.backtracks = 0
+        self._build()
+
+    def _build(self):
+        # Node 0 is the root, nodes 1..4n^2 are column headers
+        n = self.size
+        n_cols = 4 * n * n
+        self.L = L = [i - 1 for i in range(n_cols + 1)]
+        self.R = R = [i + 1 for i in range(n_cols + 1)]
+        L[0], R[n_cols] = n_cols, 0
+        self.U = U = list(range(n_cols + 1))
+        self.D = D = list(range(n_cols + 1))
+        self.C = C = list(range(n_cols + 1))
+        self.S = S = [0] * (n_cols + 1)
+        self.row_of = row_of = [-1] * (n_cols + 1)
+        self.row_start = []
+
+        cell_base, row_base, col_base, box_base = 1, 1 + n * n, 1 + 2 * n * n, 1 + 3 * n * n
+        for r in range(n):
+            for c in range(n):
+                box = self.geometry.box_of[r][c]
+                for d in range(n):
+                    row_id = (r * n + c) * n + d
+                    columns = (cell_base + r * n + c, row_base + r * n + d,
+                               col_base + c * n + d, box_base + box * n + d)
+                    first = len(C)
+                    self.row_start.append(first)
+                    for k, col in enumerate(columns):
+                        node = first + k
+                        L.append(first + (k - 1) % 4)
+                        R.append(first + (k + 1) % 4)
+                        U.append(U[col])
+                        D.append(col)
+                        D[U[col]] = node
+                        U[col] = node
+                        C.append(col)
+                        row_of.append(row_id)
+                        S[col] += 1
+
+        # Givens are selected up front; a given whose columns are already
+        # covered clashes with an earlier one.
+        covered = [False] * (n_cols + 1)
+        for r in range(n):
+            for c in range(n):
+                num = self.givens[r][c]
+                if num == 0:
+                    self.board[r][c] = 0
+                    continue
+                if not 1 <= num <= n:
+                    self.consistent = False
+                    continue
+                first = self.row_start[(r * n + c) * n + num - 1]
+                row_nodes = range(first, first + 4)
+                if any(covered[C[node]] for node in row_nodes):
+                    self.consistent = False
+                    continue
+                for node in row_nodes:
+                    covered[C[node]] = True
+                    self._cover(C[node])
+                self.board[r][c] = num
+        self._dirty = False
+
+    def _cover(self, col: int):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        L[R[col]] = L[col]
+        R[L[col]] = R[col]
+        i = D[col]
+        while i != col:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def _uncover(self, col: int):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[col]
+        while i != col:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[col]] = col
+        R[L[col]] = col
+
+    def _select(self, node: int):
+        R, C = self.R, self.C
+        j = R[node]
+        while j != node:
+            self._cover(C[j])
+            j = R[j]
+        cell, d = divmod(self.row_of[node], self.size)
+        row, col = divmod(cell, self.size)
+        self.board[row][col] = d + 1
+        return (row, col, 0, d + 1)
+
+    def _unselect(self, node: int):
+        L, C = self.L, self.C
+        j = L[node]
+        while j != node:
+            self._uncover(C[j])
+            j = L[j]
+        cell, d = divmod(self.row_of[node], self.size)
+        row, col = divmod(cell, self.size)
+        self.board[row][col] = 0
+        return (row, col, d + 1, 0)
+
+    def _search(self, steps: bool = False):
+        """Yield None at each solution and, if steps is set, the
+        (row, col, old, new) diff of every placement and removal. The board
+        holds the current partial fill.
+        """
+        if self._dirty:
+            self._build()
+        self._dirty = True
+        if not self.consistent:
+            return
+        R, D, S = self.R, self.D, self.S
+
+        # One [column, current row node] frame per level of the search
+        stack = []
+        while not self.cancelled:
+            if R[0] == 0:
+                yield None
+            else:
+                # Branch on the column with the fewest remaining rows
+                best, size = 0, self.size + 1
+                col = R[0]
+                while col:
+                    if S[col] < size:
+                        best, size = col, S[col]
+                        if size <= 1:
+                            break
+                    col = R[col]
+                self._cover(best)
+                stack.append([best, best])
+
+            # Advance the top frame to its next row, unwinding exhausted levels
+            while stack:
+                frame = stack[-1]
+                col, node = frame
+                if node != col:
+                    diff = self._unselect(node)
+                    self.backtracks += 1
+                    if steps:
+                        yield diff
+                node = D[node]
+                if node != col:
+                    frame[1] = node
+                    self.nodes += 1
+                    diff = self._select(node)
+                    if steps:
+                        yield diff
+                    break
+                self._uncover(col)
+                stack.pop()
+            else:
+                return
+
+    def cancel(self):
+        self.cancelled = True
+
+    def solve(self) -> bool:
+        for _ in self._search():
+            self.solved = True
+            break
+        return self.solved
+
+    def solutions(self, limit: Optional[int] = None):
+        """Yield a copy of each solution, stopping after limit if given."""
+        found = 0
+        for _ in self._search():
+            yield [row[:] for row in self.board]
+            found += 1
+            if limit is not None and found >= limit:
+                return
+
+    def count_solutions(self, limit: Optional[int] = None) -> int:
+        found = 0
+        for _ in self._search():
+            found += 1
+            if limit is not None and found >= limit:
+                break
+        return found
+
+    def is_unique(self) -> bool:
+        return self.count_solutions(limit=2) == 1
+
+    def solve_generator(self, diffs: bool = False):
+        """Same events as SudokuSolver.solve_generator, stopping at the first solution."""
+        for diff in self._search(steps=True):
+            if diff is None:
+                self.solved = True
+                break
+            if diffs:
+                yield diff
+            else:
+                yield (self.board, diff[:2], False)
+        if not diffs:
+            yield (self.board, None, self.solved)
+
+def make_solver(board, strategy: str = "naive"):
+    if strategy == "dlx":
+        return DLXSolver(board)
+    return SudokuSolver(board, strategy)
+
+def solve_board(board, strategy: str = "naive"):
+    """Solve board in place and return the solver for its result and counters."""
+    solver = make_solver(board, strategy)
+    solver.solve()
+    return solver
+
+class BulkSudokuSolver:
+    """Propagate naked and hidden singles across many boards at once.
+
+    Boards are an (N, 9, 9) uint8 array and candidates an (N, 81) array of
+    9-bit masks; every rule is applied to all still-active boards with array
+    ops. Boards that propagation cannot finish are handed to a per-board
+    solver of the given strategy.
+    """
+
+    def __init__(self, boards, strategy: str = "mrv"):
+        if np is None:
+            raise ImportError("BulkSudokuSolver requires numpy")
+        self.boards = np.array(boards, dtype=np.uint8).reshape(-1, 9, 9)
+        self.strategy = strategy
+        n = len(self.boards)
+        self.candidates = np.zeros((n, 81), dtype=np.uint16)
+        self.solved = np.zeros(n, dtype=bool)
+        self.failed = np.zeros(n, dtype=bool)
+        self.by_propagation = 0
+        self.by_search = 0
+
+        cells = np.arange(81)
+        self._units = np.array([[r * 9 + c for r, c in cells_] for _, _, cells_ in UNITS])
+        self._cell_units = np.stack([cells // 9, 9 + cells % 9, 18 + (cells // 27) * 3 + (cells % 9) // 3], axis=1)
+        self._digit_bits = (1 << np.arange(9)).astype(np.uint16)
+        self._bit_of = np.array([0] + [1 << d for d in range(9)], dtype=np.uint16)
+        self._single = np.array([m.bit_length() if m and not m & (m - 1) else 0
+                                 for m in range(ALL_DIGITS + 1)], dtype=np.uint8)
+
+    def propagate(self):
+        flat = self.boards.reshape(-1, 81)
+        units = self._units
+        active = np.flatnonzero(~(self.solved | self.failed))
+        while active.size:
+            b = flat[active]
+            unit_bits = self._bit_of[b][:, units]
+            placed = np.bitwise_or.reduce(unit_bits, axis=2)
+            # A repeated digit makes the bit sum differ from the bit union
+            dead = (unit_bits.sum(axis=2, dtype=np.uint32) != placed).any(axis=1)
+
+            used = np.bitwise_or.reduce(placed[:, self._cell_units], axis=2)
+            empty = b == 0
+            cand = np.where(empty, ALL_DIGITS & ~used, 0).astype(np.uint16)
+            self.candidates[active] = cand
+            dead |= (empty & (cand == 0)).any(axis=1)
+
+            # Digits possible in at least one / at least two cells of each unit
+            unit_cand = cand[:, units]
+            once = np.zeros_like(placed)
+            twice = np.zeros_like(placed)
+            for k in range(9):
+                twice |= once & unit_cand[:, :, k]
+                once |= unit_cand[:, :, k]
+            dead |= ((once | placed) != ALL_DIGITS).any(axis=1)
+            hidden = once & ~twice
+
+            new = b.copy()
+            naked = self._single[cand]
+            np.copyto(new, naked, where=naked > 0)
+            for k in range(9):
+                hit = unit_cand[:, :, k] & hidden
+                # A cell that is the only home for two digits is a contradiction
+                dead |= (hit & (hit - 1) != 0).any(axis=1)
+                m, u = np.nonzero(hit)
+                new[m, units[u, k]] = self._single[hit[m, u]]
+
+            done = ~dead & ~empty.any(axis=1)
+            self.solved[active[done]] = True
+            self.failed[active[dead]] = True
+            flat[active] = np.where(dead[:, None], b, new)
+            active = active[~dead & ~done & (new != b).any(axis=1)]
+        self.by_propagation = int(self.solved.sum())
+
+    def solve(self):
+        """Solve every board in place and return the boolean solved mask."""
+        self.propagate()
+        for i in np.flatnonzero(~(self.solved | self.failed)):
+            board = self.boards[i].tolist()
+            if solve_board(board, self.strategy).solved:
+                self.boards[i] = board
+                self.solved[i] = True
+                self.by_search += 1
+        return self.solved
+
+# Ratings by the weakest technique set that solves a puzzle: naked singles,
+# naked + hidden singles, or search with few / many backtracks.
+RATINGS = ("easy", "medium", "hard", "expert")
+
+def rate_puzzle(board) -> str:
+    solver = SudokuSolver([row[:] for row in board], "mrv")
+    if not solver.consistent:
+        raise ValueError("Puzzle has conflicting givens")
+    if not solver._propagate(hidden_singles=False):
+        raise ValueError("Puzzle has no solution")
+    if solver.find_empty_cell() is None:
+        return "easy"
+    if not solver._propagate():
+        raise ValueError("Puzzle has no solution")
+    if solver.find_empty_cell() is None:
+        return "medium"
+    if not solver.solve():
+        raise ValueError("Puzzle has no solution")
+    return "hard" if solver.backtracks < 10 else "expert"
+
+def random_full_grid(box_size: int = 3, rng: Optional[random.Random] = None) -> list:
+    """A random complete grid: the diagonal boxes, which never constrain each
+    other, are filled with random permutations and the rest solved."""
+    rng = rng or random.Random()
+    k, n = box_size, box_size * box_size
+    board = [[0] * n for _ in range(n)]
+    for b in range(k):
+        digits = rng.sample(range(1, n + 1), n)
+        for i in range(n):
+            board[b * k + i // k][b * k + i % k] = digits[i]
+    SudokuSolver(board, "mrv").solve()
+    return board
+
+def generate_puzzle(box_size: int = 3, rng: Optional[random.Random] = None, symmetric: bool = True):
+    """Generate a puzzle with a unique solution.
+
+    Clues are removed in random order (in 180-degree symmetric pairs if
+    symmetric), each removal kept only while the solution stays unique.
+    Returns (puzzle, solution, rating).
+    """
+    rng = rng or random.Random()
+    solution = random_full_grid(box_size, rng)
+    n = len(solution)
+    puzzle = [row[:] for row in solution]
+
+    cells = [(r, c) for r in range(n) for c in range(n)]
+    if symmetric:
+        cells = [(r, c) for r, c in cells if (r, c) <= (n - 1 - r, n - 1 - c)]
+    rng.shuffle(cells)
+    for r, c in cells:
+        group = {(r, c), (n - 1 - r, n - 1 - c)} if symmetric else {(r, c)}
+        saved = [(cell, puzzle[cell[0]][cell[1]]) for cell in group]
+        for cell, _ in saved:
+            puzzle[cell[0]][cell[1]] = 0
+        if SudokuSolver([row[:] for row in puzzle], "mrv").count_solutions(limit=2) != 1:
+            for (row, col), num in saved:
+                puzzle[row][col] = num
+    return puzzle, solution, rate_puzzle(puzzle)
+
+def generate_task(seed: int, box_size: int = 3, rating: Optional[str] = None, symmetric: bool = True):
+    """Generate one puzzle string from seed, retrying until it has the rating."""
+    rng = random.Random(seed)
+    while True:
+        puzzle, _, puzzle_rating = generate_puzzle(box_size, rng, symmetric)
+        if rating is None or puzzle_rating == rating:
+            return format_board(puzzle), puzzle_rating
+
+def generate_puzzles(out, count: int, box_size: int = 3, rating: Optional[str] = None, seed: Optional[int] = None,
+                     workers: Optional[int] = None, symmetric: bool = True):
+    """Write count generated puzzles, one 'puzzle<TAB>rating' line each.
+
+    Puzzle i is generated from seed + i, so runs with the same seed are
+    reproducible regardless of the number of workers.
+    """
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    task = partial(generate_task, box_size=box_size, rating=rating, symmetric=symmetric)
+    workers = workers or os.cpu_count() or 1
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        seeds = range(seed, seed + count)
+        results = pool.imap(task, seeds, chunksize=4) if pool else map(task, seeds)
+        for puzzle, puzzle_rating in results:
+            out.write(f"{puzzle}\t{puzzle_rating}\n")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+def parse_puzzle(line: str) -> list:
+    """Parse a puzzle line of n^2 characters for an n x n board.
+
+    '0' or '.' marks an empty cell; digits above 9 are written A, B, ...
+    """
+    line = line.strip()
+    size = math.isqrt(len(line))
+    box_size = math.isqrt(size)
+    if size < 1 or size * size != len(line) or box_size * box_size != size or size > len(DIGIT_CHARS):
+        raise ValueError(f"Expected 81, 256 or 625 characters, got {len(line)}")
+    board = [[0] * size for _ in range(size)]
+    for i, ch in enumerate(line.upper()):
+        if ch in "0.":
+            continue
+        num = DIGIT_CHARS.find(ch) + 1
+        if not 1 <= num <= size:
+            raise ValueError(f"Invalid character {ch!r} at position {i}")
+        board[i // size][i % size] = num
+    return board
+
+def format_board(board) -> str:
+    return "".join(DIGIT_CHARS[num - 1] if num else "0" for row in board for num in row)
+
+# Canonical forms cover boards up to 16x16; the 2 * (k!)^2 transforms of a
+# 25x25 board are too many to scan per lookup.
+CANONICAL_MAX_BOX = 4
+
+@lru_cache(maxsize=None)
+def _canonical_transforms(box_size: int):
+    """Flat index lists for every transposition x band x stack permutation.
+
+    Cell i of a transformed board is cell perm[i] of the original.
+    """
+    k, n = box_size, box_size * box_size
+    transforms = []
+    for transpose in (False, True):
+        for bands in permutations(range(k)):
+            for stacks in permutations(range(k)):
+                rows = [band * k + i for band in bands for i in range(k)]
+                cols = [stack * k + j for stack in stacks for j in range(k)]
+                if transpose:
+                    transforms.append([cols[c] * n + rows[r] for r in range(n) for c in range(n)])
+                else:
+                    transforms.append([rows[r] * n + cols[c] for r in range(n) for c in range(n)])
+    return transforms
+
+def canonical_form(board):
+    """Canonical key of a puzzle under transposition, band and stack
+    permutations and digit relabeling.
+
+    Returns (key, perm, labels): key is the smallest relabeled puzzle string,
+    perm the cell mapping that produced it and labels[d - 1] the original
+    digit for canonical digit d. Equivalent puzzles share a key.
+    """
+    geo = board_geometry(board)
+    if geo.box_size > CANONICAL_MAX_BOX:
+        raise ValueError(f"Canonical forms only cover boards up to {CANONICAL_MAX_BOX ** 2}x{CANONICAL_MAX_BOX ** 2}")
+    flat = [num for row in board for num in row]
+    best = None
+    for perm in _canonical_transforms(geo.box_size):
+        relabel = {}
+        key = []
+        for i in perm:
+            num = flat[i]
+            if num:
+                if num not in relabel:
+                    relabel[num] = len(relabel) + 1
+                key.append(relabel[num])
+            else:
+                key.append(0)
+        if best is None or key < best[0]:
+            best = (key, perm, relabel)
+
+    key, perm, relabel = best
+    labels = sorted(relabel, key=relabel.get)
+    # Digits missing from the puzzle are interchangeable; give them the
+    # remaining canonical labels in order
+    labels += [num for num in range(1, geo.size + 1) if num not in relabel]
+    return format_board([key]), perm, labels
+
+def from_canonical(solution: str, perm, labels) -> list:
+    """Map a canonical solution string back onto the original board layout."""
+    size = math.isqrt(len(solution))
+    flat = [0] * len(solution)
+    for i, ch in enumerate(solution):
+        flat[perm[i]] = labels[DIGIT_CHARS.index(ch)]
+    return [flat[r * size:(r + 1) * size] for r in range(size)]
+
+# Strategies slow enough per puzzle that a canonical lookup (a scan of 72
+# transforms on a 9x9 board) costs less than solving; by default the others
+# key the cache by the raw puzzle string. --canonical-cache overrides this.
+CANONICAL_STRATEGIES = ("naive",)
+
+class SolutionCache:
+    """On-disk LRU cache of solutions.
+
+    With canonical, solutions are keyed and stored in canonical form, so a
+    hit on any relabeled, transposed or band/stack-shuffled copy of a puzzle
+    maps back to its layout. Otherwise the key is the puzzle string itself,
+    which is much cheaper to compute. Either way a key is a puzzle string
+    and the stored solution solves that string, so both kinds of entry can
+    share a file. Unsolvable puzzles are cached too, as an empty solution.
+    Each process should open its own SolutionCache on the shared file;
+    get_many and put_many batch a whole chunk of puzzles into one transaction.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000, canonical: bool = True):
+        self.path = path
+        self.max_entries = max_entries
+        self.canonical = canonical
+        self.hits = self.misses = 0
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode this only syncs at checkpoints; a crash can lose the
+        # last few entries but never corrupts the cache
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS solutions "
+                          "(key TEXT PRIMARY KEY, solution TEXT NOT NULL, used REAL NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)")
+        self.conn.commit()
+        self.puts = 0
+
+    def _key(self, board):
+        """(key, perm, labels) for board, as returned by canonical_form."""
+        if self.canonical and len(board) <= CANONICAL_MAX_BOX ** 2:
+            return canonical_form(board)
+        size = len(board)
+        return format_board(board), range(size * size), list(range(1, size + 1))
+
+    def get_many(self, boards):
+        """Return (found, solution) per board; solution is None for an unsolvable puzzle."""
+        keys = [self._key(board) for board in boards]
+        rows = {}
+        unique = list({key for key, _, _ in keys})
+        for i in range(0, len(unique), 500):  # stay under SQLite's bound parameter limit
+            batch = unique[i:i + 500]
+            rows.update(self.conn.execute(f"SELECT key, solution FROM solutions WHERE key IN "
+                                          f"({','.join('?' * len(batch))})", batch))
+        if rows:
+            now = time.time()
+            with self.conn:
+                self.conn.executemany("UPDATE solutions SET used = ? WHERE key = ?", [(now, key) for key in rows])
+
+        results = []
+        for key, perm, labels in keys:
+            if key not in rows:
+                self.misses += 1
+                results.append((False, None))
+                continue
+            self.hits += 1
+            results.append((True, from_canonical(rows[key], perm, labels) if rows[key] else None))
+        return results
+
+    def get(self, board):
+        """Return (found, solution); solution is None for an unsolvable puzzle."""
+        return self.get_many([board])[0]
+
+    def put_many(self, items):
+        """Store (board, solution) pairs; solution is None if the board has none."""
+        now = time.time()
+        rows = []
+        for board, solution in items:
+            key, perm, labels = self._key(board)
+            if solution is None:
+                stored = ""
+            else:
+                flat = [num for row in solution for num in row]
+                relabel = {num: label for label, num in enumerate(labels, 1)}
+                stored = format_board([[relabel[flat[i]] for i in perm]])
+            rows.append((key, stored, now))
+        if not rows:
+            return
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)", rows)
+        self.puts += len(rows)
+        if self.puts >= 100:
+            self.puts = 0
+            self.evict()
+
+    def put(self, board, solution):
+        """Store the solution of board, or None if it has none."""
+        self.put_many([(board, solution)])
+
+    def evict(self):
+        """Drop the least recently used entries beyond max_entries."""
+        with self.conn:
+            count = self.conn.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute("DELETE FROM solutions WHERE key IN "
+                                  "(SELECT key FROM solutions ORDER BY used LIMIT ?)", (count - self.max_entries,))
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return f"Cache: {self.hits} hits / {self.misses} misses ({rate:.0f}% hit rate)"
+
+    def close(self):
+        self.conn.close()
+
+_caches = {}
+
+def _open_cache(path: str, canonical: bool = True) -> SolutionCache:
+    # One connection per worker process, opened on first use
+    if (path, canonical) not in _caches:
+        _caches[path, canonical] = SolutionCache(path, canonical=canonical)
+    return _caches[path, canonical]
+
+def solve_line(line: str, strategy: str = "mrv"):
+    """Solve one puzzle line, returning (output, elapsed seconds, cache hit)."""
+    start = time.perf_counter()
+    try:
+        board = parse_puzzle(line)
+    except ValueError:
+        return "invalid", time.perf_counter() - start, False
+    solver = solve_board(board, strategy)
+    output = format_board(solver.board) if solver.solved else "unsolvable"
+    return output, time.perf_counter() - start, False
+
+def solve_chunk(lines, strategy: str = "mrv", cache: Optional[str] = None, bulk: bool = True,
+                canonical: Optional[bool] = None):
+    """Solve a list of puzzle lines, with one cache lookup and one cache
+    update for the whole chunk.
+
+    With bulk the 9x9 boards go through BulkSudokuSolver and larger boards are
+    solved one by one; otherwise every board is. canonical chooses canonical
+    cache keys; None uses them for the CANONICAL_STRATEGIES without bulk.
+    Returns (output, elapsed seconds, cache hit) per line, where elapsed is
+    the chunk's time averaged over its puzzles.
+    """
+    start = time.perf_counter()
+    outputs = ["invalid"] * len(lines)
+    hits = [False] * len(lines)
+    parsed = []
+    for i, line in enumerate(lines):
+        try:
+            parsed.append((i, parse_puzzle(line)))
+        except ValueError:
+            pass
+    solutions = []
+    if cache:
+        if canonical is None:
+            canonical = strategy in CANONICAL_STRATEGIES and not bulk
+        store = _open_cache(cache, canonical)
+        misses = []
+        for (i, board), (found, solution) in zip(parsed, store.get_many([board for _, board in parsed])):
+            if found:
+                outputs[i] = format_board(solution) if solution else "unsolvable"
+                hits[i] = True
+            else:
+                misses.append((i, board))
+        parsed = misses
+
+    bulk_index, bulk_boards = [], []
+    for i, board in parsed:
+        if bulk and np is not None and len(board) == 9:
+            bulk_index.append(i)
+            bulk_boards.append(board)
+            continue
+        puzzle = [row[:] for row in board]
+        solver = solve_board(board, strategy)
+        if not solver.cancelled:
+            solutions.append((puzzle, board if solver.solved else None))
+        outputs[i] = format_board(board) if solver.solved else "unsolvable"
+
+    if bulk_boards:
+        bulk_solver = BulkSudokuSolver(np.array(bulk_boards, dtype=np.uint8).reshape(-1, 9, 9), strategy)
+        bulk_solver.solve()
+        for i, puzzle, board, solved in zip(bulk_index, bulk_boards, bulk_solver.boards, bulk_solver.solved):
+            board = board.tolist()
+            solutions.append((puzzle, board if solved else None))
+            outputs[i] = format_board(board) if solved else "unsolvable"
+    if cache:
+        store.put_many(solutions)
+    elapsed = (time.perf_counter() - start) / max(len(lines), 1)
+    return [(output, elapsed, hit) for output, hit in zip(outputs, hits)]
+
+def _chunks(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def batch_solve(lines, out, strategy: str = "mrv", workers: Optional[int] = None, chunksize: int = 64,
+                bulk: bool = False, cache: Optional[str] = None, canonical: Optional[bool] = None):
+    """Solve puzzles from an iterable of lines, writing results in input order.
+
+    Each output line is the solution (or 'unsolvable'/'invalid') followed by
+    the solve time in milliseconds. With bulk, each worker task is a chunk of
+    chunksize puzzles solved by BulkSudokuSolver. With cache, puzzles are
+    looked up in (and added to) the SolutionCache at that path a chunk at a
+    time. With canonical, puzzles are matched by canonical form, so copies
+    equivalent up to symmetry hit; None does so only for the strategies in
+    CANONICAL_STRATEGIES without bulk. Returns (puzzles, solved, cache hits).
+    """
+    puzzles = (line for line in lines if line.strip())
+    workers = workers or os.cpu_count() or 1
+    total = solved = hits = 0
+
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        if bulk or cache:
+            solve = partial(solve_chunk, strategy=strategy, cache=cache, bulk=bulk, canonical=canonical)
+            tasks = _chunks(puzzles, chunksize)
+            chunks = pool.imap(solve, tasks) if pool else map(solve, tasks)
+            results = (result for chunk in chunks for result in chunk)
+        else:
+            solve = partial(solve_line, strategy=strategy)
+            results = pool.imap(solve, puzzles, chunksize) if pool else map(solve, puzzles)
+        for output, elapsed, hit in results:
+            total += 1
+            solved += output not in ("invalid", "unsolvable")
+            hits += hit
+            out.write(f"{output}\t{elapsed * 1000:.3f}\n")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return total, solved, hits
+
+def compare_throughput(lines, strategy: str = "mrv"):
+    """Time BulkSudokuSolver against per-board solving on the same puzzles.
+
+    Returns (bulk boards/s, per-board boards/s).
+    """
+    boards = [parse_puzzle(line) for line in lines if line.strip()]
+    start = time.perf_counter()
+    BulkSudokuSolver(boards, strategy).solve()
+    bulk_rate = len(boards) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for board in boards:
+        solve_board([row[:] for row in board], strategy)
+    single_rate = len(boards) / (time.perf_counter() - start)
+    return bulk_rate, single_rate
 
 class SudokuApp:
-    def __init__(self, root):
+    def __init__(self, root, cache: Optional[SolutionCache] = None):
         self.root = root
         self.root.title("Sudoku Solver Animation")
-        self.delay = 10  
+        self.cache = cache
+        self.target_fps = 30
+        # Fraction of each frame spent advancing the solver; the rest is left to Tk
+        self.frame_budget = 0.5
         self.default_fg = "white"
+        self.animation_job = None
+        # Instant solves run on a worker thread, polled from the Tk loop
+        self.solve_timeout = 30.0
+        self.poll_interval = 100
+        self.solve_thread = None
+        self.box_size = 3
         self.create_widgets()
 
-    def create_widgets(self):
-        self.entries = [[None for _ in range(9)] for _ in range(9)]
-        self.grid_frame = tk.Frame(self.root, bg="black")
-        self.grid_frame.grid(row=0, column=0, padx=10, pady=10)
+    @property
+    def size(self) -> int:
+        return self.box_size * self.box_size
 
-        for r in range(9):
-            for c in range(9):
-                padx = (5, 1) if c % 3 == 0 and c != 0 else (1, 1)
-                pady = (5, 1) if r % 3 == 0 and r != 0 else (1, 1)
-                entry = tk.Entry(self.grid_frame, width=3, font=("Arial", 18), justify="center", bd=2)
-                entry.grid(row=r, column=c, padx=padx, pady=pady, ipadx=5, ipady=5)
-                self.entries[r][c] = entry
+    def create_widgets(self):
+        self.create_grid()
 
         btn_style = {"font": ("Arial", 14), "bd": 3, "relief": "raised", "bg": "white", "fg": "black"}
         tk.Button(self.root, text="Animate Solve", command=self.animate_solve_sudoku, **btn_style)\
@@ -72,11 +1186,53 @@ class SudokuApp:
         tk.Button(self.root, text="Clear", command=self.clear_board, **btn_style)\
             .grid(row=3, column=0, pady=10, sticky="ew")
 
+        self.strategy = tk.StringVar(value=STRATEGIES[0])
+        tk.OptionMenu(self.root, self.strategy, *STRATEGIES).grid(row=4, column=0, pady=5, sticky="ew")
+        self.stats_label = tk.Label(self.root, text="", font=("Arial", 12))
+        self.stats_label.grid(row=5, column=0, pady=5)
+        self.rate_label = tk.Label(self.root, text="", font=("Arial", 12))
+        self.rate_label.grid(row=6, column=0, pady=5)
+        tk.Button(self.root, text="Cancel", command=self.cancel_solve, **btn_style)\
+            .grid(row=7, column=0, pady=10, sticky="ew")
+
+        self.board_size = tk.StringVar(value="9x9")
+        tk.OptionMenu(self.root, self.board_size, *BOARD_SIZES, command=self.set_board_size)\
+            .grid(row=8, column=0, pady=5, sticky="ew")
+
+    def create_grid(self):
+        size, box = self.size, self.box_size
+        font_size, pad = {3: (18, 5), 4: (12, 3), 5: (9, 1)}.get(box, (9, 1))
+        self.entries = [[None for _ in range(size)] for _ in range(size)]
+        self.grid_frame = tk.Frame(self.root, bg="black")
+        self.grid_frame.grid(row=0, column=0, padx=10, pady=10)
+
+        for r in range(size):
+            for c in range(size):
+                padx = (5, 1) if c % box == 0 and c != 0 else (1, 1)
+                pady = (5, 1) if r % box == 0 and r != 0 else (1, 1)
+                entry = tk.Entry(self.grid_frame, width=3, font=("Arial", font_size), justify="center", bd=2)
+                entry.grid(row=r, column=c, padx=padx, pady=pady, ipadx=pad, ipady=pad)
+                self.entries[r][c] = entry
+        # What the entries currently show, so redraws only touch changed cells
+        self.displayed = [[0] * size for _ in range(size)]
+        self.highlighted = None
+
+    def set_board_size(self, label: str):
+        box_size = BOARD_SIZES[label]
+        if box_size == self.box_size:
+            return
+        self.cancel_solve()
+        self.grid_frame.destroy()
+        self.box_size = box_size
+        self.create_grid()
+        self.stats_label.config(text="")
+        self.rate_label.config(text="")
+
     def get_board(self) -> list:
         board = []
-        for r in range(9):
+        for r in range(self.size):
             row = []
-            for c in range(9):
+            for c in range(self.size):
                 val = self.entries[r][c].get()
                 try:
                     num = int(val)
@@ -86,70 +1242,235 @@ class SudokuApp:
             board.append(row)
         return board
 
-    def update_board(self, board, highlight=None):
-        for r in range(9):
-            for c in range(9):
+    def sync_board(self, board):
+        # Full redraw that makes the entries and self.displayed agree with board
+        for r in range(len(board)):
+            for c in range(len(board)):
                 entry = self.entries[r][c]
                 entry.delete(0, tk.END)
                 if board[r][c] != 0:
                     entry.insert(0, str(board[r][c]))
-                if highlight and (r, c) == highlight:
-                    entry.config(fg="red")
-                else:
-                    entry.config(fg=self.default_fg)
+                entry.config(fg=self.default_fg)
+        self.displayed = [row[:] for row in board]
+        self.highlighted = None
+
+    def apply_changes(self, changes, highlight=None):
+        for (r, c), value in changes.items():
+            if self.displayed[r][c] != value:
+                entry = self.entries[r][c]
+                entry.delete(0, tk.END)
+                if value != 0:
+                    entry.insert(0, str(value))
+                self.displayed[r][c] = value
+        if highlight != self.highlighted:
+            if self.highlighted:
+                self.entries[self.highlighted[0]][self.highlighted[1]].config(fg=self.default_fg)
+            if highlight:
+                self.entries[highlight[0]][highlight[1]].config(fg="red")
+            self.highlighted = highlight
+
+    def update_board(self, board, highlight=None):
+        size = len(board)
+        self.apply_changes({(r, c): board[r][c] for r in range(size) for c in range(size)}, highlight)
         self.root.update_idletasks()
 
+    def stop_animation(self):
+        if self.animation_job is not None:
+            self.root.after_cancel(self.animation_job)
+            self.animation_job = None
+
     def animate_solve_sudoku(self):
+        if self.solve_thread is not None:
+            return
+        self.stop_animation()
         board = self.get_board()
-        self.solver = SudokuSolver(board)
-        self.solver_generator = self.solver.solve_generator()
+        self.sync_board(board)
+        self.solver = make_solver(board, self.strategy.get())
+        self.solver_generator = self.solver.solve_generator(diffs=True)
+        self.rate_start = time.perf_counter()
+        self.rate_frames = self.rate_steps = 0
         self.animate_step()
 
     def animate_step(self):
-        try:
-            board, highlight, solved = next(self.solver_generator)
-            self.update_board(board, highlight)
-            if solved:
-                self.update_board(board)
-                return
-            self.root.after(self.delay, self.animate_step)
-        except StopIteration:
-            if all(all(cell != 0 for cell in row) for row in self.solver.board):
-                self.update_board(self.solver.board)
-            else:
-                messagebox.showerror("Error", "No solution exists!")
+        # Advance the solver for part of a frame, then redraw only the cells
+        # that changed; many solver steps are coalesced into one Tk frame.
+        frame_start = time.perf_counter()
+        interval = 1.0 / self.target_fps
+        deadline = frame_start + interval * self.frame_budget
+        changes, highlight, steps, finished = {}, self.highlighted, 0, True
+        for row, col, _, new in self.solver_generator:
+            changes[(row, col)] = new
+            highlight = (row, col)
+            steps += 1
+            if steps % 32 == 0 and time.perf_counter() >= deadline:
+                finished = False
+                break
+
+        self.apply_changes(changes, None if finished else highlight)
+        self.show_stats(self.solver)
+        self.show_rates(steps, force=finished)
+        if not finished:
+            delay = interval - (time.perf_counter() - frame_start)
+            self.animation_job = self.root.after(max(1, int(delay * 1000)), self.animate_step)
+            return
+        self.animation_job = None
+        if not self.solver.solved:
+            messagebox.showerror("Error", "No solution exists!")
+
+    def show_rates(self, steps: int, force: bool = False):
+        self.rate_frames += 1
+        self.rate_steps += steps
+        elapsed = time.perf_counter() - self.rate_start
+        if elapsed >= 0.5 or (force and elapsed > 0):
+            self.rate_label.config(text=f"FPS: {self.rate_frames / elapsed:.0f} | "
+                                        f"Steps/s: {self.rate_steps / elapsed:.0f}")
+            self.rate_start = time.perf_counter()
+            self.rate_frames = self.rate_steps = 0
 
     def solve_sudoku(self):
+        if self.solve_thread is not None:
+            return
+        self.stop_animation()
         board = self.get_board()
-        solver = SudokuSolver(board)
-        if self.backtrack_solve(solver):
+        self.sync_board(board)
+        if self.cache and self.solve_cached(board):
+            return
+        self.puzzle = [row[:] for row in board]
+        self.instant_solver = make_solver(board, self.strategy.get())
+        self.solve_result = None
+        self.solve_start = time.perf_counter()
+        self.timed_out = False
+        self.solve_thread = threading.Thread(target=self.run_instant_solve, args=(self.instant_solver,), daemon=True)
+        self.solve_thread.start()
+        self.root.after(self.poll_interval, self.poll_solve)
+
+    def solve_cached(self, board) -> bool:
+        found, solution = self.cache.get(board)
+        if not found:
+            return False
+        self.stats_label.config(text=self.cache.stats())
+        if solution:
+            self.update_board(solution)
+        else:
+            messagebox.showerror("Error", "No solution exists!")
+        return True
+
+    def run_instant_solve(self, solver):
+        # Worker thread: never touches Tk, only the result attribute
+        self.solve_result = self.backtrack_solve(solver)
+
+    def poll_solve(self):
+        solver = self.instant_solver
+        elapsed = time.perf_counter() - self.solve_start
+        if self.solve_thread.is_alive():
+            if elapsed > self.solve_timeout and not solver.cancelled:
+                self.timed_out = True
+                solver.cancel()
+            self.stats_label.config(text=f"Nodes: {solver.nodes} ({solver.nodes / elapsed:.0f}/s) | "
+                                         f"Backtracks: {solver.backtracks}")
+            self.root.after(self.poll_interval, self.poll_solve)
+            return
+
+        self.solve_thread = None
+        self.show_stats(solver)
+        if self.cache and not solver.cancelled:
+            self.cache.put(self.puzzle, solver.board if self.solve_result else None)
+        if solver.cancelled:
+            reason = f"timed out after {self.solve_timeout:.0f}s" if self.timed_out else "was cancelled"
+            messagebox.showinfo("Cancelled", f"Solve {reason}.")
+        elif self.solve_result:
             self.update_board(solver.board)
         else:
             messagebox.showerror("Error", "No solution exists!")
 
-    def backtrack_solve(self, solver: SudokuSolver) -> bool:
-        empty = solver.find_empty_cell()
-        if not empty:
-            return True
-        row, col = empty
-        for num in range(1, 10):
-            if solver.is_valid(row, col, num):
-                solver.board[row][col] = num
-                if self.backtrack_solve(solver):
-                    return True
-                solver.board[row][col] = 0
-        return False
+    def cancel_solve(self):
+        if self.solve_thread is not None:
+            self.instant_solver.cancel()
+        self.stop_animation()
+
+    def backtrack_solve(self, solver) -> bool:
+        return solver.solve()
+
+    def show_stats(self, solver):
+        self.stats_label.config(text=f"Nodes: {solver.nodes} | Backtracks: {solver.backtracks}")
 
     def clear_board(self):
-        for r in range(9):
-            for c in range(9):
-                self.entries[r][c].delete(0, tk.END)
-                self.entries[r][c].config(fg=self.default_fg)
+        self.cancel_solve()
+        self.stop_animation()
+        self.sync_board([[0] * self.size for _ in range(self.size)])
+        self.stats_label.config(text="")
+        self.rate_label.config(text="")
 
 def main():
-    root = tk.Tk()
-    app = SudokuApp(root)
-    root.mainloop()
+    parser = argparse.ArgumentParser(description="Sudoku solver. Opens the GUI unless --batch or --generate is given.")
+    parser.add_argument("--batch", metavar="FILE", help="solve one puzzle per line (81, 256 or 625 characters) from FILE ('-' for stdin)")
+    parser.add_argument("-o", "--output", metavar="FILE", help="write batch results to FILE instead of stdout")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="mrv", help="solver strategy for batch mode")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for batch solving or generation (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=64, help="puzzles sent to a worker at a time")
+    parser.add_argument("--bulk", action="store_true",
+                        help="solve each chunk with the vectorized NumPy solver (try --chunksize 4096)")
+    parser.add_argument("--compare", action="store_true",
+                        help="report bulk vs per-board throughput for the batch file instead of solving it")
+    parser.add_argument("--generate", type=int, metavar="N", help="generate N puzzles with unique solutions")
+    parser.add_argument("--rating", choices=RATINGS, help="only keep generated puzzles with this rating")
+    parser.add_argument("--box-size", type=int, default=3, help="box size of generated puzzles (3 for 9x9)")
+    parser.add_argument("--seed", type=int, help="seed for reproducible generation")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="SQLite file caching solutions for the GUI and batch mode; puzzles are matched "
+                             "by canonical form for the GUI and the naive strategy")
+    parser.add_argument("--canonical-cache", choices=("auto", "on", "off"), default="auto",
+                        help="match batch puzzles in the cache by canonical form, so copies that differ only by "
+                             "symmetry or relabeling hit; auto does so for the naive strategy without --bulk")
+    args = parser.parse_args()
+
+    if args.generate is not None:
+        out = open(args.output, "w") if args.output else sys.stdout
+        start = time.perf_counter()
+        try:
+            generate_puzzles(out, args.generate, args.box_size, args.rating, args.seed, args.workers)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        elapsed = time.perf_counter() - start
+        print(f"Generated {args.generate} puzzles in {elapsed:.2f}s "
+              f"({args.generate / elapsed * 60:.0f} puzzles/min)", file=sys.stderr)
+        return
+
+    if args.batch is None:
+        root = tk.Tk()
+        cache = SolutionCache(args.cache) if args.cache else None
+        app = SudokuApp(root, cache)
+        root.mainloop()
+        if cache:
+            cache.close()
+        return
+
+    src = sys.stdin if args.batch == "-" else open(args.batch)
+    if args.compare:
+        with src:
+            bulk_rate, single_rate = compare_throughput(src.readlines(), args.strategy)
+        print(f"Bulk: {bulk_rate:.0f} boards/s | Per-board {args.strategy}: {single_rate:.0f} boards/s "
+              f"({bulk_rate / single_rate:.1f}x)")
+        return
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        canonical = None if args.canonical_cache == "auto" else args.canonical_cache == "on"
+        total, solved, hits = batch_solve(src, out, args.strategy, args.workers, args.chunksize, args.bulk,
+                                          args.cache, canonical)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0
+    print(f"Solved {solved}/{total} puzzles in {elapsed:.2f}s ({rate:.0f} puzzles/s)", file=sys.stderr)
+    if args.cache:
+        print(f"Cache: {hits} hits / {total - hits} misses", file=sys.stderr)
 
 if __name__ == '__main__':
     main()
@@ -5,6 +5,7 @@ import torch
 from ultralytics import YOLO
 from datetime import datetime
 import numpy as np
+from performance import FrameSkipController, PerformanceMonitor
 
 # Initialize YOLO model
 MODEL_NAME = "yolov8n.pt"  # Using nano model for faster processing
@@ -21,6 +22,8 @@ print("Model loaded.")
 CONF_THRESH = 0.50  # Confidence threshold
 IOU_THRESH = 0.50   # IOU threshold for NMS
 PERSON_CLASS_ID = 0  # COCO dataset person class ID
+TARGET_FPS = 30  # Frame rate the detection rate is tuned for
+MAX_STALENESS = 0.25  # Seconds the drawn boxes may lag the frame
 
 # Tracking variables
 tracked_persons = {}  # Dictionary to store tracked person IDs
@@ -73,6 +76,11 @@ print("👁️  Person detection active. Alerts will show for new people.")
 frame_count = 0
 start_time = time.time()
 
+# Detection starts on every 3rd frame and is retuned from measured latency
+perf_monitor = PerformanceMonitor()
+frame_skip = FrameSkipController(TARGET_FPS, MAX_STALENESS, rate=3)
+frames_since_detection = 0
+
 while True:
     ok, frame = cap.read()
     if not ok:
@@ -80,9 +88,12 @@ while True:
     
     frame_count += 1
     current_time = time.time()
+    frames_since_detection += 1
+    detect_time = None
     
-    # Process every 3rd frame for performance
-    if frame_count % 3 == 0:
+    # Process every Nth frame, N chosen by the frame skip controller
+    if frames_since_detection >= frame_skip.update(perf_monitor):
+        frames_since_detection = 0
         # Run YOLO detection with tracking
         results = model.track(
             frame,
@@ -94,48 +105,48 @@ while True:
             persist=True,
             classes=[PERSON_CLASS_ID]  # Only detect persons
         )[0]
+        detect_time = time.time() - current_time
         
         current_person_ids = set()
         
-        if results.boxes is not None:
-            for box in results.boxes:
-                # Get box coordinates and info
-                xyxy = box.xyxy[0].cpu().numpy().astype(int)
-                conf = float(box.conf[0].cpu())
-                track_id = int(box.id[0].cpu()) if box.id is not None else None
+        if results.boxes is not None and results.boxes.id is not None:
+            # One device-to-host copy per frame; tracked rows are x1, y1, x2, y2, id, conf, cls
+            data = results.boxes.data.cpu().numpy()
+            boxes = data[:, :4].astype(int)
+            track_ids = data[:, 4].astype(int)
+            confs = data[:, 5]
+            for xyxy, track_id, conf in zip(boxes.tolist(), track_ids.tolist(), confs.tolist()):
+                current_person_ids.add(track_id)
                 
-                if track_id is not None:
-                    current_person_ids.add(track_id)
+                # Check if this is a new person
+                if track_id not in tracked_persons:
+                    # Check if we should alert (not in cooldown)
+                    should_alert = True
+                    box_center = get_box_center(xyxy)
+                    
+                    # Check against recent alerts to avoid duplicate alerts for same person
+                    for cooled_id, (cooled_time, cooled_pos) in list(new_person_cooldown.items()):
+                        if current_time - cooled_time > COOLDOWN_TIME:
+                            del new_person_cooldown[cooled_id]
+                        elif calculate_distance(box_center, cooled_pos) < ALERT_DISTANCE_THRESHOLD:
+                            should_alert = False
+                            break
                     
-                    # Check if this is a new person
-                    if track_id not in tracked_persons:
-                        # Check if we should alert (not in cooldown)
-                        should_alert = True
-                        box_center = get_box_center(xyxy)
-                        
-                        # Check against recent alerts to avoid duplicate alerts for same person
-                        for cooled_id, (cooled_time, cooled_pos) in list(new_person_cooldown.items()):
-                            if current_time - cooled_time > COOLDOWN_TIME:
-                                del new_person_cooldown[cooled_id]
-                            elif calculate_distance(box_center, cooled_pos) < ALERT_DISTANCE_THRESHOLD:
-                                should_alert = False
-                                break
-                        
-                        if should_alert:
-                            alert_new_person(track_id, current_time)
-                            new_person_cooldown[track_id] = (current_time, box_center)
-                        
-                        tracked_persons[track_id] = current_time
-                    else:
-                        # Update last seen time
-                        tracked_persons[track_id] = current_time
+                    if should_alert:
+                        alert_new_person(track_id, current_time)
+                        new_person_cooldown[track_id] = (current_time, box_center)
                     
-                    # Draw bounding box and label
-                    x1, y1, x2, y2 = xyxy
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    label = f"Person {track_id} ({conf:.2f})"
-                    cv2.putText(frame, label, (x1, y1 - 8),
-                              cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+                    tracked_persons[track_id] = current_time
+                else:
+                    # Update last seen time
+                    tracked_persons[track_id] = current_time
+                
+                # Draw bounding box and label
+                x1, y1, x2, y2 = xyxy
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                label = f"Person {track_id} ({conf:.2f})"
+                cv2.putText(frame, label, (x1, y1 - 8),
+                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
         
         # Remove persons not seen for 5 seconds
         for person_id in list(tracked_persons.keys()):
@@ -144,16 +155,23 @@ while True:
     
     # Display stats
     fps = frame_count / (current_time - start_time)
-    cv2.putText(frame, f"FPS: {fps:.1f} | Persons: {len(tracked_persons)}", 
+    cv2.putText(frame, f"FPS: {fps:.1f} | Persons: {len(tracked_persons)} | Detect 1/{frame_skip.rate}", 
                 (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
     
     # Show frame
     cv2.imshow("Person Detection & Alert System", frame)
+    key = cv2.waitKey(1) & 0xFF
+    
+    # Everything after the frame grab counts as this frame's work
+    perf_monitor.update(current_time, detect_time)
+    perf_monitor.add_work_time(time.time() - current_time - (detect_time or 0.0))
     
-    if cv2.waitKey(1) & 0xFF == ord("q"):
+    if key == ord("q"):
         break
 
 # Cleanup
 cap.release()
 cv2.destroyAllWindows()
+if frame_skip.decisions:
+    print(f"Frame skip: detecting every {frame_skip.rate} frames; {frame_skip.decisions[-1][2]}")
 print("\n✅ Camera released and windows closed.")
@@ -0,0 +1,135 @@
+import time
+import numpy as np
+from typing import Optional, Tuple, Dict
+from collections import deque, defaultdict
+
+class PerformanceMonitor:
+    """Monitor and display performance metrics"""
+    def __init__(self, window_size: int = 30):
+        self.window_size = window_size
+        self.frame_times = deque(maxlen=window_size)
+        self.processing_times = deque(maxlen=window_size)
+        self.display_fps = 0.0
+        self.processing_fps = 0.0
+        self.avg_processing_time = 0.0
+        self.overlay_times = defaultdict(lambda: deque(maxlen=window_size))
+        self.stage_times = defaultdict(lambda: deque(maxlen=window_size))
+        self.queue_depths = defaultdict(lambda: deque(maxlen=window_size))
+        self.work_times = deque(maxlen=window_size)
+        
+    def update(self, frame_time: float, processing_time: Optional[float] = None):
+        self.frame_times.append(frame_time)
+        if processing_time is not None:
+            self.processing_times.append(processing_time)
+        
+        # Calculate FPS
+        if len(self.frame_times) > 1:
+            time_span = self.frame_times[-1] - self.frame_times[0]
+            self.display_fps = len(self.frame_times) / time_span if time_span > 0 else 0
+        
+        if len(self.processing_times) > 0:
+            self.avg_processing_time = np.mean(self.processing_times)
+            self.processing_fps = 1.0 / self.avg_processing_time if self.avg_processing_time > 0 else 0
+            
+    def add_overlay_time(self, overlay: str, seconds: float):
+        """Record how long one overlay took to draw"""
+        self.overlay_times[overlay].append(seconds)
+        
+    def overlay_breakdown(self) -> Dict[str, float]:
+        """Average draw time per overlay in milliseconds"""
+        return {name: float(np.mean(times)) * 1000 for name, times in self.overlay_times.items() if times}
+        
+    def add_stage_time(self, stage: str, seconds: float, queue_depth: int):
+        """Record one frame's time in a pipeline stage and how many frames were waiting for it"""
+        self.stage_times[stage].append(seconds)
+        self.queue_depths[stage].append(queue_depth)
+        
+    def add_work_time(self, seconds: float):
+        """Record a frame's work outside detection, for the frame skip controller"""
+        self.work_times.append(seconds)
+        
+    @property
+    def avg_work_time(self) -> float:
+        return float(np.mean(self.work_times)) if self.work_times else 0.0
+        
+    def stage_breakdown(self) -> Dict[str, Tuple[float, float]]:
+        """Average time per frame in milliseconds and average queue depth per stage"""
+        return {name: (float(np.mean(times)) * 1000, float(np.mean(self.queue_depths[name])))
+                for name, times in self.stage_times.items() if times}
+        
+    def add_processing_time(self, processing_time: float):
+        """Record an inference time measured outside the display loop"""
+        self.processing_times.append(processing_time)
+        self.avg_processing_time = np.mean(self.processing_times)
+        self.processing_fps = 1.0 / self.avg_processing_time if self.avg_processing_time > 0 else 0
+
+class FrameSkipController:
+    """Choose how often to run detection from PerformanceMonitor measurements.
+    
+    Detecting every rate frames adds detect_time / rate to each frame's other
+    work and leaves the drawn boxes up to rate - 1 frames plus one detection
+    behind. The controller picks the smallest rate that keeps frames within
+    the target_fps budget, capped by the largest rate that keeps that lag
+    under max_staleness seconds. Frame times are predicted from the measured
+    costs rather than the measured FPS, which itself depends on the current
+    rate. When the staleness limit leaves no room to skip a frame it cannot
+    be met at any rate, so the FPS target decides instead. Each update moves
+    the rate by at most a factor of two. parallelism is the number of
+    detectors sharing the load.
+    """
+    def __init__(self, target_fps: float, max_staleness: float, rate: int = 2, parallelism: int = 1,
+                 interval: float = 1.0):
+        self.target_fps = target_fps
+        self.max_staleness = max_staleness
+        self.rate = rate
+        self.parallelism = parallelism
+        self.interval = interval
+        self.next_update = 0.0
+        self.decisions = deque(maxlen=100)
+        self.changes = 0
+        self.outcome = None
+        
+    def staleness(self, rate: int, detect_time: float, frame_time: float, streams: int) -> float:
+        """Predicted lag of the drawn boxes at rate; frames never arrive faster than target_fps"""
+        frame_period = max((frame_time + detect_time / self.parallelism / rate) * streams, 1.0 / self.target_fps)
+        return detect_time + (rate - 1) * frame_period
+        
+    def update(self, monitor: PerformanceMonitor, streams: int = 1) -> int:
+        """Re-evaluate at most once per interval and return the rate to use"""
+        now = time.time()
+        if now < self.next_update or not monitor.work_times or monitor.avg_processing_time <= 0:
+            return self.rate
+        self.next_update = now + self.interval
+        
+        detect_time = float(monitor.avg_processing_time)
+        detect_share = detect_time / self.parallelism
+        frame_time = monitor.avg_work_time
+        
+        budget = 1.0 / (self.target_fps * streams)
+        fastest = max(int(np.ceil(detect_share / (budget - frame_time))), 1) if budget > frame_time else None
+        # The lag grows with the rate, so step up while the next rate stays within the limit
+        freshest = 1
+        while self.staleness(freshest + 1, detect_time, frame_time, streams) <= self.max_staleness:
+            freshest += 1
+        limit = f"{self.max_staleness * 1000:.0f}ms staleness limit"
+        if fastest is not None and fastest <= freshest:
+            rate, outcome = fastest, "both targets met"
+        elif freshest > 1:
+            rate, outcome = freshest, f"held by the {limit}, {self.target_fps:.0f} FPS out of reach"
+        elif fastest is not None:
+            # Detecting on every frame would only trade frame rate for lag the detector adds anyway
+            rate, outcome = fastest, f"{limit} cannot be met, following the {self.target_fps:.0f} FPS target"
+        else:
+            rate, outcome = self.rate, f"{limit} and {self.target_fps:.0f} FPS both out of reach"
+        
+        # Stage times mix frames from earlier rates, so move at most a factor of two per update
+        rate = min(max(rate, (self.rate + 1) // 2), self.rate * 2)
+        if rate != self.rate or outcome != self.outcome:
+            reason = (f"detection {detect_time * 1000:.1f}ms, other work {frame_time * 1000:.1f}ms/frame; "
+                      f"{outcome}")
+            self.decisions.append((now, rate, reason))
+            if rate != self.rate:
+                self.changes += 1
+            self.rate = rate
+            self.outcome = outcome
+        return self.rate
@@ -1,16 +1,45 @@
 import time
+import inspect
 import cv2
 import torch
 import numpy as np
 from ultralytics import YOLO
+from ultralytics.engine.results import Results
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+import yaml
 import threading
 import queue
-from dataclasses import dataclass
-from typing import Optional, Tuple, Dict, List
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import argparse
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, Dict, List, Union
 import json
 import os
+import sys
 from datetime import datetime
 from collections import deque, defaultdict
+from performance import FrameSkipController, PerformanceMonitor
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".webm")
+
+# Fixed colour table for track IDs, drawn once from a private generator so the
+# global NumPy RNG is never touched
+PALETTE_SIZE = 1024
+TRACK_PALETTE = [tuple(color) for color in np.random.default_rng(0).integers(0, 255, (PALETTE_SIZE, 3)).tolist()]
+UNTRACKED_COLOR = (0, 255, 0)
+
+CONTROLS = [
+    "Q: Quit | P: Pause | T: Toggle Tracks",
+    "S: Toggle Stats | R: Record | D: Save Detections"
+]
+
+# Stages downstream of inference, each fed by a bounded queue of
+# (stream, slot, frame, detections); the last one hands slots back to the readers
+PIPELINE_STAGES = ("annotate", "display", "record")
+STAGE_DONE = object()
 
 @dataclass
 class TrackerConfig:
@@ -18,66 +47,553 @@ class TrackerConfig:
     model_name: str = "yolov8s.pt"
     conf_thresh: float = 0.50
     iou_thresh: float = 0.50
-    frame_skip_rate: int = 2
+    frame_skip_rate: int = 2  # run detection every this many frames; the starting rate when adaptive
+    adaptive_skip: bool = False  # retune frame_skip_rate from measured latency while running
+    target_fps: float = 30.0  # per-stream frame rate the adaptive skip aims for
+    max_staleness: float = 0.25  # seconds the drawn detections may lag the frame they are drawn on
     max_queue_size: int = 5
     video_size: Tuple[int, int] = (640, 480)
     max_tracks_history: int = 30
+    max_tracks: int = 256  # track slots per stream; the least recently seen track is evicted when full
+    track_ttl: int = 60  # processed frames after which an unseen track is evicted
     enable_recording: bool = False
     recording_fps: int = 30
-    save_detections: bool = False
-    
-class PerformanceMonitor:
-    """Monitor and display performance metrics"""
-    def __init__(self, window_size: int = 30):
-        self.window_size = window_size
-        self.frame_times = deque(maxlen=window_size)
-        self.processing_times = deque(maxlen=window_size)
-        self.display_fps = 0.0
-        self.processing_fps = 0.0
-        self.avg_processing_time = 0.0
-        
-    def update(self, frame_time: float, processing_time: Optional[float] = None):
-        self.frame_times.append(frame_time)
-        if processing_time is not None:
-            self.processing_times.append(processing_time)
-        
-        # Calculate FPS
-        if len(self.frame_times) > 1:
-            time_span = self.frame_times[-1] - self.frame_times[0]
-            self.display_fps = len(self.frame_times) / time_span if time_span > 0 else 0
-        
-        if len(self.processing_times) > 0:
-            self.avg_processing_time = np.mean(self.processing_times)
-            self.processing_fps = 1.0 / self.avg_processing_time if self.avg_processing_time > 0 else 0
+    save_detections: bool = False  # stream detections to rotating JSON Lines files in output_dir
+    log_max_bytes: int = 64 * 1024 * 1024  # size at which the detection log rotates to a new file
+    batch_size: int = 1  # frames per model call; 1 tracks each frame with model.track
+    batch_max_wait: float = 0.02  # seconds to wait for a batch to fill after its first frame
+    sources: List[Union[int, str]] = field(default_factory=list)  # devices, RTSP URLs or video files; empty probes the default camera
+    headless: bool = False  # no windows or overlays; frames are only drawn while recording
+    sink_path: Optional[str] = None  # JSON Lines file for per-frame detections, "-" for stdout
+    offline: bool = False  # process video files without dropping frames, writing annotated output per file
+    output_dir: str = "."
+    decode_ahead: int = 64  # frames decoded ahead of inference per file in offline mode
+    max_concurrent: int = 2  # files decoded at once in offline mode; the rest wait their turn
+    inference_workers: int = 0  # detector processes fed through shared memory; 0 runs the model in-process
+    stage_queue_size: int = 4  # frames buffered between pipeline stages
+    
+class JsonLinesSink:
+    """Write one JSON record per processed frame; mode "w" replaces an existing file"""
+    def __init__(self, path: str, mode: str = "a"):
+        self.file = sys.stdout if path == "-" else open(path, mode)
+        
+    def emit(self, record: dict):
+        self.file.write(json.dumps(record) + "\n")
+        
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+@dataclass
+class Detections:
+    """Detections of one frame as contiguous arrays"""
+    boxes: np.ndarray  # (N, 4) int32 xyxy
+    confs: np.ndarray  # (N,) float32
+    classes: np.ndarray  # (N,) int32
+    ids: np.ndarray  # (N,) int32 track IDs, -1 when untracked
+    
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32),
+                   np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32))
+    
+    @classmethod
+    def from_results(cls, results: Optional[object]) -> "Detections":
+        """Convert model results with a single device-to-host copy"""
+        if results is None or results.boxes is None or len(results.boxes) == 0:
+            return cls.empty()
+        # Rows are x1, y1, x2, y2, [track id,] conf, cls
+        data = results.boxes.data.cpu().numpy()
+        if data.shape[1] == 7:
+            ids, confs, classes = data[:, 4], data[:, 5], data[:, 6]
+        else:
+            ids, confs, classes = np.full(len(data), -1), data[:, 4], data[:, 5]
+        return cls(data[:, :4].astype(np.int32), confs.astype(np.float32),
+                   classes.astype(np.int32), ids.astype(np.int32))
+    
+    def __len__(self) -> int:
+        return len(self.confs)
+    
+    def to_records(self, class_names: Dict[int, str]) -> List[dict]:
+        """JSON-ready records, one per detection"""
+        return [
+            {'track_id': track_id, 'class': class_names[cls_id], 'confidence': conf, 'bbox': bbox}
+            for bbox, conf, cls_id, track_id in zip(self.boxes.tolist(), self.confs.tolist(),
+                                                    self.classes.tolist(), self.ids.tolist())
+        ]
+
+def inference_worker(model_name: str, device: str, conf_thresh: float, iou_thresh: float, num_threads: int,
+                     tasks: mp.Queue, done: mp.Queue):
+    """Worker process: detect on frames in shared memory and return compact arrays"""
+    # Split the cores between workers instead of each starting one thread per core
+    torch.set_num_threads(num_threads)
+    model = YOLO(model_name)
+    model.to(device)
+    done.put(("ready", model.names, 0.0))
+    
+    blocks = {}
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job, block_name, shape = task
+        if block_name not in blocks:
+            blocks[block_name] = shared_memory.SharedMemory(name=block_name)
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=blocks[block_name].buf)
+        
+        start = time.time()
+        try:
+            results = model.predict(frame, imgsz=640, conf=conf_thresh, iou=iou_thresh, device=device, verbose=False)[0]
+            detections = results.boxes.data.cpu().numpy()
+        except Exception as e:
+            print(f"Error during worker inference: {e}")
+            detections = np.zeros((0, 6), dtype=np.float32)
+        done.put((job, detections, time.time() - start))
+    
+    for block in blocks.values():
+        block.close()
+
+class InferenceProcessPool:
+    """YOLO detection in worker processes, with frames passed through shared memory.
+    
+    Each in-flight frame is copied once into a shared memory block that the
+    workers map directly; they send back (N, 6) arrays of xyxy, conf and class.
+    submit never waits, so capture and rendering keep running while the
+    workers are busy.
+    """
+    def __init__(self, config: TrackerConfig, device: str, num_workers: int, capacity: int):
+        ctx = mp.get_context("spawn")
+        self.tasks = ctx.Queue()
+        self.done = ctx.Queue()
+        self.blocks: List[Optional[shared_memory.SharedMemory]] = [None] * capacity
+        self.free = list(range(capacity))
+        self.jobs = {}
+        self.next_job = 0
+        
+        print(f"Starting {num_workers} inference worker(s)...")
+        num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        self.processes = [
+            ctx.Process(target=inference_worker, daemon=True,
+                        args=(config.model_name, device, config.conf_thresh, config.iou_thresh, num_threads,
+                              self.tasks, self.done))
+            for _ in range(num_workers)
+        ]
+        for process in self.processes:
+            process.start()
+        ready = 0
+        while ready < num_workers:
+            try:
+                _, self.names, _ = self.done.get(timeout=1.0)
+                ready += 1
+            except queue.Empty:
+                try:
+                    self.check_workers()
+                except RuntimeError:
+                    self.close()
+                    raise
+        print("Inference workers ready.")
+        
+    def check_workers(self):
+        """Raise if a worker process has died, e.g. while loading the model or out of memory"""
+        for process in self.processes:
+            if not process.is_alive():
+                raise RuntimeError(f"Inference worker {process.pid} exited with code {process.exitcode}")
+        
+    @property
+    def in_flight(self) -> int:
+        return len(self.jobs)
+        
+    def submit(self, frame: np.ndarray, tag: object) -> bool:
+        """Queue a frame for detection; False if every block is in flight"""
+        if not self.free:
+            return False
+        index = self.free.pop()
+        block = self.blocks[index]
+        if block is None or block.size < frame.nbytes:
+            if block is not None:
+                block.close()
+                block.unlink()
+            block = self.blocks[index] = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        np.ndarray(frame.shape, dtype=np.uint8, buffer=block.buf)[...] = frame
+        
+        job = self.next_job
+        self.next_job += 1
+        self.jobs[job] = (index, tag, frame.shape)
+        self.tasks.put((job, block.name, frame.shape))
+        return True
+        
+    def poll(self, timeout: float = 0.0) -> List[Tuple[object, Tuple[int, ...], np.ndarray, float]]:
+        """Collect finished jobs as (tag, frame shape, detections, inference time)"""
+        finished = []
+        while self.jobs:
+            try:
+                job, detections, elapsed = self.done.get(timeout=timeout) if not finished and timeout > 0 \
+                    else self.done.get_nowait()
+            except queue.Empty:
+                # Jobs held by a dead worker would never finish
+                self.check_workers()
+                break
+            index, tag, shape = self.jobs.pop(job)
+            self.free.append(index)
+            finished.append((tag, shape, detections, elapsed))
+        return finished
+        
+    def close(self):
+        for process in self.processes:
+            if process.is_alive():
+                self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for block in self.blocks:
+            if block is not None:
+                block.close()
+                block.unlink()
+
+class FrameRing:
+    """Preallocated frame slots passed between a reader thread and the tracking loop.
+    
+    The reader decodes straight into a free slot with cap.read(image=slot) and
+    commits it under the next sequence number. The consumer holds a slot until
+    it is done drawing on it, then releases it for reuse. With drop_old, get
+    returns the newest frame and skips older ones, and a reader with no free
+    slot overwrites the oldest unread frame; otherwise the reader waits for a
+    slot so that no frame is lost.
+    """
+    FREE, WRITING, READY, HELD = range(4)
+    
+    def __init__(self, capacity: int, frame_shape: Tuple[int, ...], drop_old: bool = True):
+        self.buffers = [np.empty(frame_shape, dtype=np.uint8) for _ in range(capacity)]
+        self.states = [self.FREE] * capacity
+        self.seqs = [-1] * capacity
+        self.next_seq = 0
+        self.dropped = 0
+        self.drop_old = drop_old
+        self.cond = threading.Condition()
+        
+    def __len__(self) -> int:
+        """Number of committed frames not yet taken"""
+        return self.states.count(self.READY)
+        
+    def acquire(self, timeout: Optional[float] = None) -> Optional[int]:
+        """Reserve a slot to decode into, or None if none is free"""
+        with self.cond:
+            while True:
+                if self.FREE in self.states:
+                    index = self.states.index(self.FREE)
+                elif self.drop_old and self.READY in self.states:
+                    index = min((i for i, s in enumerate(self.states) if s == self.READY), key=self.seqs.__getitem__)
+                    self.dropped += 1
+                else:
+                    # Every slot is held by the consumer
+                    if self.drop_old or not self.cond.wait(timeout):
+                        return None
+                    continue
+                self.states[index] = self.WRITING
+                return index
+            
+    def commit(self, index: int, frame: np.ndarray):
+        """Publish a decoded slot; frame replaces the buffer if the decoder had to reallocate it"""
+        with self.cond:
+            self.buffers[index] = frame
+            self.seqs[index] = self.next_seq
+            self.next_seq += 1
+            self.states[index] = self.READY
+            
+    def abort(self, index: int):
+        with self.cond:
+            self.states[index] = self.FREE
+            self.cond.notify()
+            
+    def get(self) -> Optional[Tuple[int, int, np.ndarray]]:
+        """Take a committed frame as (slot, sequence number, frame), or None if there is none"""
+        with self.cond:
+            ready = [i for i, s in enumerate(self.states) if s == self.READY]
+            if not ready:
+                return None
+            if self.drop_old:
+                index = max(ready, key=self.seqs.__getitem__)
+                for i in ready:
+                    if i != index:
+                        self.states[i] = self.FREE
+                        self.dropped += 1
+            else:
+                index = min(ready, key=self.seqs.__getitem__)
+            self.states[index] = self.HELD
+            return index, self.seqs[index], self.buffers[index]
+            
+    def release(self, index: int):
+        """Hand a slot back to the reader once the frame is no longer needed"""
+        with self.cond:
+            self.states[index] = self.FREE
+            self.cond.notify()
+            
+    @property
+    def idle(self) -> bool:
+        """True when no slot is being decoded into, waiting or held"""
+        with self.cond:
+            return all(state == self.FREE for state in self.states)
+            
+    def clear(self):
+        """Drop the slot buffers of a finished stream"""
+        with self.cond:
+            self.buffers = []
+
+class TrackStore:
+    """Preallocated ring buffers of track centre points, one slot per live track ID.
+    
+    Each slot holds its points twice, at i and i + history, so the newest
+    history points are always one contiguous view that can go straight to
+    cv2.polylines. Tracks not seen for ttl updates are evicted, and a new ID
+    arriving with every slot taken reuses the least recently seen one, so
+    memory stays fixed however long the run is.
+    """
+    def __init__(self, capacity: int, history: int, ttl: int):
+        self.history = history
+        self.ttl = ttl
+        self.points = np.zeros((capacity, 2 * history, 2), dtype=np.int32)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.slot_of: Dict[int, int] = {}
+        self.free = list(range(capacity - 1, -1, -1))
+        self.updates = 0
+        self.evicted = 0
+        
+    def __len__(self) -> int:
+        return len(self.slot_of)
+        
+    def evict(self, slots: np.ndarray):
+        for slot in slots.tolist():
+            del self.slot_of[int(self.ids[slot])]
+            self.ids[slot] = -1
+            self.counts[slot] = 0
+            self.free.append(slot)
+        self.evicted += len(slots)
+        
+    def allocate(self, track_id: int) -> int:
+        """Give a new track ID a slot, evicting the least recently seen track if none is free"""
+        if not self.free:
+            in_use = np.flatnonzero(self.ids != -1)
+            self.evict(in_use[[np.argmin(self.last_seen[in_use])]])
+        slot = self.free.pop()
+        self.slot_of[track_id] = slot
+        self.ids[slot] = track_id
+        self.last_seen[slot] = self.updates
+        return slot
+        
+    def update(self, ids: np.ndarray, centers: np.ndarray):
+        """Append one processed frame's track centres, then evict stale tracks"""
+        self.updates += 1
+        if len(ids):
+            # Mark every known ID of this frame as seen before any new ID can evict a slot
+            ids = ids.tolist()
+            known = [self.slot_of.get(track_id) for track_id in ids]
+            self.last_seen[[slot for slot in known if slot is not None]] = self.updates
+            slots = np.fromiter((self.allocate(track_id) if slot is None else slot for track_id, slot in zip(ids, known)),
+                                dtype=np.intp, count=len(ids))
+            write = self.counts[slots] % self.history
+            self.points[slots, write] = centers
+            self.points[slots, write + self.history] = centers
+            self.counts[slots] += 1
+        stale = np.flatnonzero((self.ids != -1) & (self.updates - self.last_seen >= self.ttl))
+        if len(stale):
+            self.evict(stale)
+            
+    def track(self, track_id: int) -> np.ndarray:
+        """Points of a track, oldest first, as a view into the store"""
+        slot = self.slot_of.get(track_id)
+        if slot is None:
+            return self.points[0, :0]
+        count = int(self.counts[slot])
+        end = (count - 1) % self.history + self.history + 1
+        return self.points[slot, end - min(count, self.history):end]
+
+class DetectionLogWriter:
+    """Stream detection records to rotating JSON Lines files from a background thread.
+    
+    emit never blocks the tracking loop: records wait in a bounded buffer and
+    are dropped (and counted) if the writer falls max_buffer records behind.
+    Files are flushed every flush_interval seconds and rotated at max_bytes.
+    """
+    _STOP = object()
+    
+    def __init__(self, directory: str = ".", prefix: str = "detections", max_bytes: int = 64 * 1024 * 1024,
+                 max_buffer: int = 10000, flush_interval: float = 1.0):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.records = queue.Queue(maxsize=max_buffer)
+        self.flush_requested = threading.Event()
+        self.files: List[str] = []
+        self.file = None
+        self.file_bytes = 0
+        self.written = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.writer_thread, daemon=True)
+        self.thread.start()
+        
+    @property
+    def current_file(self) -> Optional[str]:
+        return self.files[-1] if self.files else None
+        
+    def emit(self, record: dict):
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            
+    def flush(self):
+        """Ask the writer thread to flush what it has written so far"""
+        self.flush_requested.set()
+        
+    def open_next_file(self):
+        if self.file is not None:
+            self.file.close()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}_{timestamp}_{len(self.files):03d}.jsonl")
+        self.file = open(path, "w")
+        self.file_bytes = 0
+        self.files.append(path)
+        
+    def writer_thread(self):
+        last_flush = time.time()
+        while True:
+            try:
+                record = self.records.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = None
+            if record is self._STOP:
+                break
+            if record is not None:
+                line = json.dumps(record) + "\n"
+                if self.file is None or (self.file_bytes > 0 and self.file_bytes + len(line) > self.max_bytes):
+                    self.open_next_file()
+                self.file.write(line)
+                self.file_bytes += len(line)
+                self.written += 1
+            if self.file is not None and (self.flush_requested.is_set() or time.time() - last_flush >= self.flush_interval):
+                self.file.flush()
+                self.flush_requested.clear()
+                last_flush = time.time()
+        
+        if self.file is not None:
+            self.file.close()
+            
+    def close(self, summary: Optional[dict] = None):
+        """Write any final summary record, drain the buffer and stop the thread"""
+        if summary is not None:
+            self.records.put(summary)
+        self.records.put(self._STOP)
+        self.thread.join()
+
+class StreamState:
+    """Frame ring, tracking data and metrics for one video source"""
+    def __init__(self, stream_id: int, source: Union[int, str], backend: int, config: TrackerConfig):
+        self.stream_id = stream_id
+        self.source = source
+        self.backend = backend
+        self.window_name = "YOLOv8 Object Tracker" if stream_id == 0 else f"YOLOv8 Object Tracker [{stream_id}]"
+        
+        # Capture
+        # The tracking loop holds up to batch_size frames of a stream at once, and each
+        # later stage up to a full queue plus the frame it is working on
+        in_flight = config.batch_size + len(PIPELINE_STAGES) * (config.stage_queue_size + 1)
+        capacity = (config.decode_ahead if config.offline else config.max_queue_size) + in_flight
+        width, height = config.video_size
+        self.frames = FrameRing(capacity, (height, width, 3), drop_old=not config.offline)
+        self.thread = None
+        self.finished = threading.Event()
+        self.fps = float(config.recording_fps)
+        self.frames_since_detection = 0
+        
+        # Tracking data
+        self.tracks = TrackStore(config.max_tracks, config.max_tracks_history, config.track_ttl)
+        # Inference updates the store while the annotate stage draws from it
+        self.tracks_lock = threading.Lock()
+        self.object_counts = defaultdict(int)
+        self.total_detections = 0
+        self.frame_count = 0
+        self.latest_detections = Detections.empty()
+        
+        # Worker results are applied in submission order so the tracker sees frames in sequence
+        self.submitted = 0
+        self.next_result = 0
+        self.pending_results = {}
+        # Offline: detections by result order, until the frames drawn with them move on
+        self.worker_detections = {}
+        
+        # Performance monitoring and recording
+        self.perf_monitor = PerformanceMonitor()
+        self.video_writer = None
+        self.sink = None
+        # Offline: stem of the output files, unique among the run's streams
+        self.output_name = None
+        
+    @property
+    def name(self) -> str:
+        """File-name friendly name of the source"""
+        if isinstance(self.source, int):
+            return f"camera{self.source}"
+        return os.path.splitext(os.path.basename(self.source.rstrip("/")))[0] or f"stream{self.stream_id}"
 
 class ObjectTracker:
     """Main object tracking class"""
-    def __init__(self, config: TrackerConfig):
+    def __init__(self, config: TrackerConfig, load_model: bool = True):
         self.config = config
         self.device = "mps" if torch.backends.mps.is_available() else "cuda" if torch.cuda.is_available() else "cpu"
         print(f"Running on: {self.device.upper()}")
         
         # Threading
-        self.frame_queue = queue.Queue(maxsize=config.max_queue_size)
         self.stop_event = threading.Event()
+        self.frame_ready = threading.Event()
+        self.streams: List[StreamState] = []
+        # Streams being read; offline files beyond max_concurrent wait in pending_sources
+        self.active_streams: List[StreamState] = []
+        self.pending_sources = deque()
+        self.output_names = set()
+        self.next_stream = 0
         
-        # Model
+        # Model, loaded here unless inference runs in worker processes or the
+        # caller only draws (load_model=False, as in tracker_benchmark.py)
         self.model = None
-        self.load_model()
+        self.class_names = {}
+        self.workers = None
+        # Offline frames waiting for their own worker result, as (stream, slot, frame, result order)
+        self.awaiting_results = deque()
+        if config.inference_workers == 0 and load_model:
+            self.load_model()
         
-        # Tracking data
-        self.track_history = defaultdict(lambda: deque(maxlen=config.max_tracks_history))
+        # Per-stream ByteTrack state for batched inference
+        self.trackers = {}
+        
+        # Totals across all streams
         self.object_counts = defaultdict(int)
         self.total_detections = 0
         
-        # Performance monitoring
+        # Aggregate performance across all streams
         self.perf_monitor = PerformanceMonitor()
+        self.frame_skip = None
+        if config.adaptive_skip:
+            # Worker processes share the detection load
+            self.frame_skip = FrameSkipController(config.target_fps, config.max_staleness, config.frame_skip_rate,
+                                                  parallelism=max(config.inference_workers, 1))
         
-        # Recording
-        self.video_writer = None
-        self.detections_log = []
+        # Recording and output
+        self.detection_writer = None
+        if config.save_detections:
+            os.makedirs(config.output_dir, exist_ok=True)
+            self.detection_writer = DetectionLogWriter(config.output_dir, max_bytes=config.log_max_bytes)
+        self.sink = JsonLinesSink(config.sink_path) if config.sink_path else None
         
         # Display settings
+        self.controls_sprite = None
+        self.stage_error = None
+        self.recording = config.enable_recording
         self.show_tracks = True
         self.show_stats = True
         self.paused = False
@@ -87,16 +603,17 @@ class ObjectTracker:
         print(f"Loading YOLO model: {self.config.model_name}")
         self.model = YOLO(self.config.model_name)
         self.model.to(self.device)
+        self.class_names = self.model.names
         print("Model loaded.")
     
-    def frame_reader_thread(self, cap_source: int, video_backend: int):
-        """Thread function to read frames from the webcam"""
-        print(f"Attempting to open camera {cap_source} with backend {video_backend}")
-        cap = cv2.VideoCapture(cap_source, video_backend)
+    def frame_reader_thread(self, stream: StreamState):
+        """Thread function to read frames from one source"""
+        print(f"[{stream.stream_id}] Attempting to open {stream.source} with backend {stream.backend}")
+        cap = cv2.VideoCapture(stream.source, stream.backend)
         
         if not cap.isOpened():
-            print(f"Error: Could not open webcam with source {cap_source}")
-            self.stop_event.set()
+            print(f"[{stream.stream_id}] Error: Could not open source {stream.source}")
+            stream.finished.set()
             return
         
         # Set camera properties
@@ -104,32 +621,86 @@ class ObjectTracker:
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.video_size[0])
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.video_size[1])
         
-        print("Webcam opened successfully. Reading frames...")
+        source_fps = cap.get(cv2.CAP_PROP_FPS)
+        if source_fps and source_fps > 0:
+            stream.fps = source_fps
+        print(f"[{stream.stream_id}] Source opened successfully. Reading frames...")
         
-        while not self.stop_event.is_set():
+        while not self.stop_event.is_set() and not stream.finished.is_set():
             if self.paused:
                 time.sleep(0.1)
                 continue
                 
-            ok, frame = cap.read()
+            # Files wait for a free slot and never drop frames; live sources drop the oldest
+            slot = stream.frames.acquire(timeout=0.1)
+            if slot is None:
+                if self.config.offline:
+                    continue
+                # Every slot is still being drawn on: skip this frame without decoding it
+                if not cap.grab():
+                    print(f"[{stream.stream_id}] Frame grab failed or stream ended.")
+                    break
+                stream.frames.dropped += 1
+                continue
+            
+            ok, frame = cap.read(image=stream.frames.buffers[slot])
             if not ok:
-                print("Frame grab failed or stream ended.")
-                self.stop_event.set()
+                stream.frames.abort(slot)
+                print(f"[{stream.stream_id}] Frame grab failed or stream ended.")
                 break
-                
-            # Use non-blocking queue operations
-            try:
-                self.frame_queue.put(frame, timeout=0.001)
-            except queue.Full:
-                # Drop oldest frame and add new one
-                try:
-                    self.frame_queue.get_nowait()
-                    self.frame_queue.put_nowait(frame)
-                except (queue.Empty, queue.Full):
-                    pass
+            stream.frames.commit(slot, frame)
+            self.frame_ready.set()
         
         cap.release()
-        print("Frame reader thread finished.")
+        stream.finished.set()
+        self.frame_ready.set()
+        print(f"[{stream.stream_id}] Frame reader thread finished.")
+    
+    def start_stream(self, source: Union[int, str], backend: int = cv2.CAP_ANY) -> StreamState:
+        """Create a stream and start its reader thread"""
+        stream = StreamState(len(self.streams), source, backend, self.config)
+        if self.config.offline:
+            stream.output_name = self.unique_output_name(stream)
+            # Outputs are rewritten on every run, like the annotated video
+            stream.sink = JsonLinesSink(os.path.join(self.config.output_dir, f"{stream.output_name}_detections.jsonl"), "w")
+        stream.thread = threading.Thread(target=self.frame_reader_thread, args=(stream,))
+        stream.thread.daemon = True
+        stream.thread.start()
+        self.streams.append(stream)
+        self.active_streams.append(stream)
+        return stream
+    
+    def unique_output_name(self, stream: StreamState) -> str:
+        """stream.name, suffixed with the stream ID when another file of this run has the same stem"""
+        name, suffix = stream.name, stream.stream_id
+        while name in self.output_names:
+            name = f"{stream.name}_{suffix}"
+            suffix += 1
+        self.output_names.add(name)
+        return name
+    
+    def open_default_camera(self) -> bool:
+        """Try different camera configurations until one delivers frames"""
+        camera_configs = [
+            (0, cv2.CAP_AVFOUNDATION),
+            (0, cv2.CAP_ANY),
+            (1, cv2.CAP_ANY)
+        ]
+        
+        for cap_source, cap_backend in camera_configs:
+            stream = self.start_stream(cap_source, cap_backend)
+            time.sleep(2)  # Wait for camera to initialize
+            
+            if not stream.finished.is_set() and len(stream.frames) > 0:
+                print(f"Successfully opened camera {cap_source}")
+                return True
+            stream.finished.set()
+            stream.thread.join(timeout=2)
+            self.streams.remove(stream)
+            self.active_streams.remove(stream)
+        
+        print("Failed to open any camera")
+        return False
     
     def process_frame(self, frame: np.ndarray) -> Optional[object]:
         """Process a single frame with YOLO"""
@@ -149,277 +720,749 @@ class ObjectTracker:
             print(f"Error during model tracking: {e}")
             return None
     
-    def draw_detections(self, frame: np.ndarray, results: object) -> int:
-        """Draw bounding boxes and tracks on frame"""
-        object_count = 0
-        frame_detections = []
-        
-        if results and results.boxes is not None:
-            for box in results.boxes:
-                xyxy = box.xyxy[0].cpu().numpy().astype(int)
-                conf = float(box.conf[0].cpu())
-                cls_id = int(box.cls[0].cpu())
-                track_id = int(box.id[0].cpu()) if box.id is not None else -1
-                
-                object_count += 1
-                class_name = self.model.names[cls_id]
-                
-                # Update statistics
-                self.object_counts[class_name] += 1
-                self.total_detections += 1
-                
-                # Store detection
-                if self.config.save_detections:
-                    frame_detections.append({
-                        'track_id': track_id,
-                        'class': class_name,
-                        'confidence': conf,
-                        'bbox': xyxy.tolist()
-                    })
-                
-                # Draw bounding box
-                x1, y1, x2, y2 = xyxy
-                color = self.get_color_for_track(track_id)
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                
-                # Draw label
-                label = f"ID:{track_id} {class_name} {conf:.2f}" if track_id != -1 else f"{class_name} {conf:.2f}"
-                label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
-                cv2.rectangle(frame, (x1, y1 - label_size[1] - 4), (x1 + label_size[0], y1), color, -1)
-                cv2.putText(frame, label, (x1, y1 - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-                
-                # Update track history
-                if track_id != -1 and self.show_tracks:
-                    center = ((x1 + x2) // 2, (y1 + y2) // 2)
-                    self.track_history[track_id].append(center)
-                    
-                    # Draw track history
-                    points = np.array(list(self.track_history[track_id]), dtype=np.int32)
-                    if len(points) > 1:
-                        cv2.polylines(frame, [points], False, color, 2)
-        
-        if self.config.save_detections and frame_detections:
-            self.detections_log.append({
-                'timestamp': datetime.now().isoformat(),
+    def get_tracker(self, stream_id: int) -> BYTETracker:
+        """Get or create the ByteTrack tracker for a stream"""
+        if stream_id not in self.trackers:
+            with open(check_yaml("bytetrack.yaml")) as f:
+                tracker_cfg = IterableSimpleNamespace(**yaml.safe_load(f))
+            # frame_rate was dropped from the constructor in newer ultralytics releases
+            kwargs = {"frame_rate": 30} if "frame_rate" in inspect.signature(BYTETracker).parameters else {}
+            self.trackers[stream_id] = BYTETracker(args=tracker_cfg, **kwargs)
+        return self.trackers[stream_id]
+    
+    def process_batch(self, frames: List[np.ndarray], stream_ids: Optional[List[int]] = None) -> List[Optional[object]]:
+        """Detect on several frames in one model call, then track each stream separately"""
+        if stream_ids is None:
+            stream_ids = [0] * len(frames)
+        try:
+            batch_results = self.model.predict(
+                frames,
+                imgsz=640,
+                conf=self.config.conf_thresh,
+                iou=self.config.iou_thresh,
+                device=self.device,
+                verbose=False
+            )
+        except Exception as e:
+            print(f"Error during batched inference: {e}")
+            return [None] * len(frames)
+        
+        return [self.apply_tracker(stream_id, results, frame)
+                for frame, stream_id, results in zip(frames, stream_ids, batch_results)]
+    
+    def apply_tracker(self, stream_id: int, results: object, frame: Optional[np.ndarray] = None) -> object:
+        """Same update as model.track(persist=True), but with one tracker per stream
+        so frames from different cameras never share track IDs"""
+        tracks = self.get_tracker(stream_id).update(results.boxes.cpu().numpy(), frame)
+        if len(tracks) > 0:
+            results = results[tracks[:, -1].astype(int)]
+            results.update(boxes=torch.as_tensor(tracks[:, :-1]))
+        return results
+    
+    def submit_to_workers(self, stream: StreamState, frame: np.ndarray) -> bool:
+        """Send a frame to the inference workers; offline mode waits for a free block"""
+        while not self.workers.submit(frame, (stream, stream.submitted, stream.frame_count)):
+            if not self.config.offline:
+                return False
+            self.apply_worker_results(0.1)
+        stream.submitted += 1
+        return True
+    
+    def apply_worker_results(self, timeout: float = 0.0):
+        """Track and record finished worker jobs, in order within each stream"""
+        for (stream, order, frame_index), shape, detections, elapsed in self.workers.poll(timeout):
+            stream.pending_results[order] = (frame_index, shape, detections)
+            stream.perf_monitor.add_processing_time(elapsed)
+            self.perf_monitor.add_processing_time(elapsed)
+            while stream.next_result in stream.pending_results:
+                frame_index, shape, detections = stream.pending_results.pop(stream.next_result)
+                stream.next_result += 1
+                # Results only reads the shape of orig_img, so a zero-stride view stands in for the frame
+                image = np.broadcast_to(np.zeros((), dtype=np.uint8), shape)
+                results = Results(image, path="", names=self.class_names, boxes=torch.as_tensor(detections))
+                detections = self.record_results(stream, self.apply_tracker(stream.stream_id, results), frame_index)
+                if self.config.offline:
+                    stream.worker_detections[stream.next_result - 1] = detections
+    
+    def collect_round(self) -> List[Tuple[StreamState, int, np.ndarray]]:
+        """Gather up to batch_size frames, taking streams in round-robin order.
+        
+        Each pass takes at most one frame per stream, starting after the stream
+        served last, so busy sources cannot starve the others. Passes repeat
+        until the batch is full or batch_max_wait has passed since the first frame.
+        Entries are (stream, slot, frame); the caller releases each slot when done.
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.config.batch_size:
+            self.frame_ready.clear()
+            count = len(self.active_streams)
+            start = self.next_stream
+            for offset in range(count):
+                if len(batch) >= self.config.batch_size:
+                    break
+                position = (start + offset) % count
+                stream = self.active_streams[position]
+                taken = stream.frames.get()
+                if taken is None:
+                    continue
+                slot, _, frame = taken
+                batch.append((stream, slot, frame))
+                self.next_stream = (position + 1) % count
+            
+            if batch and deadline is None:
+                deadline = time.time() + self.config.batch_max_wait
+            wait = 0.1 if deadline is None else deadline - time.time()
+            if wait <= 0 or self.stop_event.is_set() or all(s.finished.is_set() for s in self.active_streams):
+                break
+            if not self.frame_ready.wait(wait) and batch:
+                break
+        return batch
+    
+    def record_results(self, stream: StreamState, results: Optional[object], frame_index: Optional[int] = None) -> Detections:
+        """Update statistics, track history and outputs from new model results"""
+        detections = Detections.from_results(results)
+        stream.latest_detections = detections
+        
+        # Update statistics
+        stream.total_detections += len(detections)
+        self.total_detections += len(detections)
+        classes, counts = np.unique(detections.classes, return_counts=True)
+        for cls_id, count in zip(classes.tolist(), counts.tolist()):
+            class_name = self.class_names[cls_id]
+            stream.object_counts[class_name] += count
+            self.object_counts[class_name] += count
+        
+        # Update track history
+        tracked = detections.ids != -1
+        centers = (detections.boxes[tracked, :2] + detections.boxes[tracked, 2:]) // 2
+        with stream.tracks_lock:
+            stream.tracks.update(detections.ids[tracked], centers)
+        
+        # Records are only built when something consumes them
+        sinks = [sink for sink in (self.sink, stream.sink) if sink is not None]
+        if not sinks and not (self.detection_writer is not None and len(detections)):
+            return detections
+        frame_detections = detections.to_records(self.class_names)
+        timestamp = datetime.now().isoformat()
+        if self.detection_writer is not None and frame_detections:
+            self.detection_writer.emit({
+                'timestamp': timestamp,
+                'stream': stream.stream_id,
                 'detections': frame_detections
             })
-        
-        return object_count
+        for sink in sinks:
+            sink.emit({
+                'timestamp': timestamp,
+                'stream': stream.stream_id,
+                'frame': stream.frame_count if frame_index is None else frame_index,
+                'detections': frame_detections
+            })
+        return detections
+    
+    def draw_detections(self, frame: np.ndarray, stream: StreamState, detections: Optional[Detections] = None) -> int:
+        """Draw bounding boxes and tracks on frame, by default the latest of the stream"""
+        if detections is None:
+            detections = stream.latest_detections
+        with stream.tracks_lock:
+            self.draw_boxes(frame, stream, detections)
+        return len(detections)
+    
+    def draw_boxes(self, frame: np.ndarray, stream: StreamState, detections: Detections):
+        for (x1, y1, x2, y2), conf, cls_id, track_id in zip(detections.boxes.tolist(), detections.confs.tolist(),
+                                                             detections.classes.tolist(), detections.ids.tolist()):
+            class_name = self.class_names[cls_id]
+            
+            # Draw bounding box
+            color = self.get_color_for_track(track_id)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            
+            # Draw label
+            label = f"ID:{track_id} {class_name} {conf:.2f}" if track_id != -1 else f"{class_name} {conf:.2f}"
+            label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
+            cv2.rectangle(frame, (x1, y1 - label_size[1] - 4), (x1 + label_size[0], y1), color, -1)
+            cv2.putText(frame, label, (x1, y1 - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+            
+            # Draw track history
+            if track_id != -1 and self.show_tracks:
+                points = stream.tracks.track(track_id)
+                if len(points) > 1:
+                    cv2.polylines(frame, [points], False, color, 2)
     
-    def draw_stats(self, frame: np.ndarray, object_count: int):
+    def draw_stats(self, frame: np.ndarray, object_count: int, stream: StreamState):
         """Draw statistics overlay"""
         if not self.show_stats:
             return
             
-        # Create semi-transparent overlay
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (350, 150), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+        # Darken the panel in place; blending black at 0.7 only scales the region.
+        # cv2.rectangle fills its corners inclusively, so the slice ends one past them
+        multi = len(self.active_streams) > 1
+        panel = frame[10:176 if multi else 151, 10:351]
+        panel[...] = cv2.convertScaleAbs(panel, alpha=0.3)
         
         # Draw stats
         y_offset = 30
+        monitor = stream.perf_monitor
         stats = [
             f"Objects: {object_count}",
-            f"Display FPS: {self.perf_monitor.display_fps:.1f}",
-            f"Process FPS: {self.perf_monitor.processing_fps:.1f}",
-            f"Avg Process Time: {self.perf_monitor.avg_processing_time*1000:.1f}ms",
-            f"Total Detections: {self.total_detections}"
+            f"Display FPS: {monitor.display_fps:.1f}",
+            f"Process FPS: {monitor.processing_fps:.1f}",
+            f"Avg Process Time: {monitor.avg_processing_time*1000:.1f}ms",
+            f"Total Detections: {stream.total_detections}"
         ]
+        if multi:
+            stats.append(f"All {len(self.active_streams)} streams: {self.perf_monitor.display_fps:.1f} FPS")
         
         for stat in stats:
             cv2.putText(frame, stat, (20, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
             y_offset += 25
     
-    def draw_controls(self, frame: np.ndarray):
-        """Draw control instructions"""
-        h, w = frame.shape[:2]
-        controls = [
-            "Q: Quit | P: Pause | T: Toggle Tracks",
-            "S: Toggle Stats | R: Record | D: Save Detections"
-        ]
+    def build_controls_sprite(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Render the static control text once as (sprite, mask, height above the first baseline)"""
+        sizes = [cv2.getTextSize(control, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1) for control in CONTROLS]
+        text_height = max(size[1] for size, _ in sizes)
+        descent = max(baseline for _, baseline in sizes)
+        width = max(size[0] for size, _ in sizes) + 1
+        height = text_height + 20 * (len(CONTROLS) - 1) + descent + 1
         
-        y_offset = h - 40
-        for control in controls:
-            cv2.putText(frame, control, (10, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        sprite = np.zeros((height, width, 3), dtype=np.uint8)
+        y_offset = text_height
+        for control in CONTROLS:
+            cv2.putText(sprite, control, (0, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             y_offset += 20
+        return sprite, sprite.any(axis=2), text_height
+    
+    def draw_controls(self, frame: np.ndarray):
+        """Draw control instructions from the cached sprite"""
+        if self.controls_sprite is None:
+            self.controls_sprite = self.build_controls_sprite()
+        sprite, mask, text_height = self.controls_sprite
+        
+        # Same placement as drawing the text at (10, h - 40), clipped to the frame
+        h, w = frame.shape[:2]
+        top = h - 40 - text_height
+        y0, x0 = max(top, 0), 10
+        y1, x1 = min(top + sprite.shape[0], h), min(x0 + sprite.shape[1], w)
+        if y1 <= y0 or x1 <= x0:
+            return
+        rows, cols = slice(y0 - top, y1 - top), x1 - x0
+        np.copyto(frame[y0:y1, x0:x1], sprite[rows, :cols], where=mask[rows, :cols, None])
     
     def get_color_for_track(self, track_id: int) -> Tuple[int, int, int]:
-        """Generate consistent color for track ID"""
+        """Look up a consistent color for track ID"""
         if track_id == -1:
-            return (0, 255, 0)
-        np.random.seed(track_id)
-        return tuple(np.random.randint(0, 255, 3).tolist())
+            return UNTRACKED_COLOR
+        # The odd multiplier permutes the palette: consecutive IDs land 433 entries
+        # apart (2654435761 % 1024), and two IDs share a colour only when they
+        # differ by a multiple of PALETTE_SIZE
+        return TRACK_PALETTE[(track_id * 2654435761) % PALETTE_SIZE]
     
-    def start_recording(self, frame_shape: Tuple[int, int]):
+    def start_recording(self, stream: StreamState, frame_shape: Tuple[int, int]):
         """Start video recording"""
-        if self.video_writer is not None:
+        if stream.video_writer is not None:
             return
             
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"tracking_{timestamp}.mp4"
+        if self.config.offline:
+            filename = os.path.join(self.config.output_dir, f"{stream.output_name}_tracked.mp4")
+            fps = stream.fps
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            suffix = f"_{stream.stream_id}" if len(self.streams) > 1 else ""
+            filename = f"tracking_{timestamp}{suffix}.mp4"
+            fps = self.config.recording_fps
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        self.video_writer = cv2.VideoWriter(filename, fourcc, self.config.recording_fps, 
-                                          (frame_shape[1], frame_shape[0]))
+        stream.video_writer = cv2.VideoWriter(filename, fourcc, fps, (frame_shape[1], frame_shape[0]))
         print(f"Started recording to {filename}")
     
     def stop_recording(self):
-        """Stop video recording"""
-        if self.video_writer is not None:
-            self.video_writer.release()
-            self.video_writer = None
-            print("Recording stopped")
+        """Stop video recording on every stream"""
+        for stream in self.streams:
+            if stream.video_writer is not None:
+                stream.video_writer.release()
+                stream.video_writer = None
+                print(f"Recording stopped for stream {stream.stream_id}")
     
-    def save_detections(self):
-        """Save detection log to JSON file"""
-        if not self.detections_log:
-            print("No detections to save")
-            return
-            
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"detections_{timestamp}.json"
-        
-        # Add summary statistics
-        summary = {
+    def detection_summary(self) -> dict:
+        """Summary statistics written at the end of the detection log"""
+        return {
             'total_detections': self.total_detections,
             'object_counts': dict(self.object_counts),
+            'stream_counts': {str(s.source): dict(s.object_counts) for s in self.streams},
             'tracking_duration': time.time() - self.start_time,
-            'detections': self.detections_log
+            'dropped_records': self.detection_writer.dropped if self.detection_writer else 0
         }
-        
-        with open(filename, 'w') as f:
-            json.dump(summary, f, indent=2)
-        print(f"Saved detections to {filename}")
     
-    def run(self):
-        """Main tracking loop"""
-        # Try different camera configurations
-        camera_configs = [
-            (0, cv2.CAP_AVFOUNDATION),
-            (0, cv2.CAP_ANY),
-            (1, cv2.CAP_ANY)
-        ]
-        
-        thread = None
-        for cap_source, cap_backend in camera_configs:
-            self.stop_event.clear()
-            thread = threading.Thread(target=self.frame_reader_thread, args=(cap_source, cap_backend))
-            thread.daemon = True
-            thread.start()
-            
-            time.sleep(2)  # Wait for camera to initialize
-            
-            if not self.stop_event.is_set() and self.frame_queue.qsize() > 0:
-                print(f"Successfully opened camera {cap_source}")
-                break
-        else:
-            print("Failed to open any camera")
+    def save_detections(self):
+        """Flush the streamed detection log to disk"""
+        if self.detection_writer is None:
+            print("Detection logging is off (enable save_detections)")
             return
+        self.detection_writer.flush()
+        print(f"Detections are being saved to {self.detection_writer.current_file or self.config.output_dir}")
+    
+    def render_frame(self, display_frame: np.ndarray, stream: StreamState, detections: Optional[Detections] = None):
+        """Draw overlays on a frame"""
+        start = time.perf_counter()
+        object_count = self.draw_detections(display_frame, stream, detections)
+        detections_done = time.perf_counter()
         
-        self.start_time = time.time()
-        frame_count = 0
-        latest_results = None
-        recording = False
+        # Draw UI elements
+        self.draw_stats(display_frame, object_count, stream)
+        stats_done = time.perf_counter()
+        self.draw_controls(display_frame)
+        controls_done = time.perf_counter()
+        
+        self.perf_monitor.add_overlay_time("detections", detections_done - start)
+        self.perf_monitor.add_overlay_time("stats", stats_done - detections_done)
+        self.perf_monitor.add_overlay_time("controls", controls_done - stats_done)
         
-        cv2.namedWindow("YOLOv8 Object Tracker", cv2.WINDOW_NORMAL)
-        print("Controls: Q=Quit, P=Pause, T=Tracks, S=Stats, R=Record, D=Save Detections")
+        if self.paused:
+            cv2.putText(display_frame, "PAUSED", (display_frame.shape[1]//2 - 50, 50),
+                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
+    
+    def annotate_frame(self, stream: StreamState, frame: np.ndarray, detections: Detections):
+        """Annotate stage; headless runs only draw on frames that are being recorded"""
+        if not self.config.headless or self.recording:
+            self.render_frame(frame, stream, detections)
+    
+    def record_frame(self, stream: StreamState, frame: np.ndarray, detections: Detections):
+        """Record stage; writers are opened and closed here so encoding stays on this thread"""
+        if self.recording:
+            self.start_recording(stream, frame.shape)
+            stream.video_writer.write(frame)
+        elif stream.video_writer is not None:
+            self.stop_recording()
+    
+    def handle_key(self, key: int):
+        """Handle keyboard input"""
+        if key == ord('q'):
+            print("Quitting...")
+            self.stop_event.set()
+        elif key == ord('p'):
+            self.paused = not self.paused
+            print(f"{'Paused' if self.paused else 'Resumed'}")
+        elif key == ord('t'):
+            self.show_tracks = not self.show_tracks
+            print(f"Tracks {'enabled' if self.show_tracks else 'disabled'}")
+        elif key == ord('s'):
+            self.show_stats = not self.show_stats
+            print(f"Stats {'enabled' if self.show_stats else 'disabled'}")
+        elif key == ord('r'):
+            # The record stage opens or closes the writers with the next frame of each stream
+            self.recording = not self.recording
+        elif key == ord('d'):
+            self.save_detections()
+    
+    def tracking_loop(self, batched: bool, outbox: queue.Queue):
+        """Inference stage: detect on frames from the capture rings until stopped or every source has ended"""
+        # Frames taken from the rings but not yet handed on; released here if the stage fails
+        held = []
+        try:
+            while not self.stop_event.is_set():
+                self.pass_on_awaiting(outbox)
+                if self.config.offline and any(s.finished.is_set() for s in self.active_streams):
+                    self.rotate_offline_streams()
+                batch = self.collect_round()
+                if not batch:
+                    if self.config.offline:
+                        self.rotate_offline_streams(0.05)
+                        if not self.active_streams:
+                            break
+                    elif all(s.finished.is_set() and len(s.frames) == 0 for s in self.active_streams):
+                        break
+                    continue
+                held = list(batch)
+                stage_start = time.perf_counter()
+                
+                # Frames due for detection according to each stream's skip rate, run as one batch
+                if self.frame_skip is not None:
+                    skip_rate = self.frame_skip.update(self.perf_monitor, len(self.active_streams))
+                else:
+                    skip_rate = self.config.frame_skip_rate
+                due = []
+                for i, (stream, _, frame) in enumerate(batch):
+                    stream.frame_count += 1
+                    stream.frames_since_detection += 1
+                    if not self.paused and stream.frames_since_detection >= skip_rate:
+                        stream.frames_since_detection = 0
+                        due.append(i)
+                batch_results = {}
+                detect_elapsed = 0.0
+                # Offline, the latest worker result each frame must wait for; -1 before the first
+                result_orders = []
+                if self.workers is not None:
+                    # Detection runs asynchronously; live frames are drawn with the latest finished results
+                    for i, (stream, _, frame) in enumerate(batch):
+                        if i in due:
+                            self.submit_to_workers(stream, frame)
+                        result_orders.append(stream.submitted - 1)
+                    self.apply_worker_results()
+                elif due:
+                    process_start = time.time()
+                    if batched:
+                        results = self.process_batch([batch[i][2] for i in due], [batch[i][0].stream_id for i in due])
+                    else:
+                        results = [self.process_frame(batch[i][2]) for i in due]
+                    detect_elapsed = time.time() - process_start
+                    process_time = detect_elapsed / len(due)
+                    batch_results = dict(zip(due, results))
+                
+                items = []
+                for i, (stream, slot, frame) in enumerate(batch):
+                    frame_time = time.time()
+                    if i in batch_results:
+                        self.record_results(stream, batch_results[i])
+                        stream.perf_monitor.update(frame_time, process_time)
+                        self.perf_monitor.update(frame_time, process_time)
+                    else:
+                        stream.perf_monitor.update(frame_time)
+                        self.perf_monitor.update(frame_time)
+                    items.append((stream, slot, frame, stream.latest_detections))
+                
+                # Queue depth here is the decoded frames still waiting in the capture rings
+                stage_elapsed = time.perf_counter() - stage_start
+                self.perf_monitor.add_stage_time("infer", stage_elapsed / len(batch),
+                                                 sum(len(s.frames) for s in self.active_streams))
+                for _ in batch:
+                    self.perf_monitor.add_work_time(max(stage_elapsed - detect_elapsed, 0.0) / len(batch))
+                if self.workers is not None and self.config.offline:
+                    # Offline output has no deadline, so each frame is drawn with its own detections
+                    for (stream, slot, frame, _), order in zip(items, result_orders):
+                        self.awaiting_results.append((stream, slot, frame, order))
+                    held = []
+                    self.pass_on_awaiting(outbox)
+                    continue
+                for item in items:
+                    outbox.put(item)
+                    held.pop(0)
+        except Exception as e:
+            self.fail_stage("infer", e)
+        finally:
+            for stream, slot, _ in held:
+                stream.frames.release(slot)
+            while self.awaiting_results:
+                stream, slot, _, _ = self.awaiting_results.popleft()
+                stream.frames.release(slot)
+            outbox.put(STAGE_DONE)
+    
+    def pass_on_awaiting(self, outbox: queue.Queue):
+        """Hand on offline frames, in order, once the worker result each one waits for is recorded"""
+        while self.awaiting_results:
+            stream, slot, frame, order = self.awaiting_results[0]
+            if stream.next_result <= order:
+                break
+            self.awaiting_results.popleft()
+            detections = stream.worker_detections.get(order, Detections.empty())
+            # Later frames of the stream only wait for this result or newer ones
+            for stale in [key for key in stream.worker_detections if key < order]:
+                del stream.worker_detections[stale]
+            outbox.put((stream, slot, frame, detections))
+    
+    def rotate_offline_streams(self, timeout: float = 0.0):
+        """Close offline files that are fully processed and start the next pending ones"""
+        if self.workers is not None:
+            self.apply_worker_results(timeout)
+        for stream in list(self.active_streams):
+            # Every frame has left the pipeline and every detection has been recorded
+            if not (stream.finished.is_set() and stream.frames.idle and stream.next_result == stream.submitted):
+                continue
+            self.active_streams.remove(stream)
+            self.next_stream = 0
+            if stream.video_writer is not None:
+                stream.video_writer.release()
+                stream.video_writer = None
+            if stream.sink is not None:
+                stream.sink.close()
+                stream.sink = None
+            self.trackers.pop(stream.stream_id, None)
+            stream.frames.clear()
+            print(f"Finished {stream.source}: {stream.frame_count} frames")
+            if self.pending_sources:
+                # The next file takes over the window of the one it replaces
+                self.start_stream(self.pending_sources.popleft()).window_name = stream.window_name
+    
+    def pass_on(self, item: tuple, outbox: Optional[queue.Queue]):
+        """Hand a frame to the next stage, or back to its reader after the last one"""
+        if outbox is None:
+            stream, slot = item[:2]
+            stream.frames.release(slot)
+        else:
+            outbox.put(item)
+    
+    def run_stage(self, name: str, work, inbox: queue.Queue, outbox: Optional[queue.Queue]):
+        """Apply work to each frame from inbox and pass it on until the stage upstream finishes.
         
-        while not self.stop_event.is_set():
+        After an error the stage stops the tracker but keeps draining its inbox,
+        so the stages before it never block on a full queue and every slot
+        still reaches the last stage to be released.
+        """
+        failed = False
+        try:
+            while True:
+                depth = inbox.qsize()
+                item = inbox.get()
+                if item is STAGE_DONE:
+                    break
+                if not failed:
+                    stream, _, frame, detections = item
+                    start = time.perf_counter()
+                    try:
+                        work(stream, frame, detections)
+                    except Exception as e:
+                        self.fail_stage(name, e)
+                        failed = True
+                    else:
+                        self.perf_monitor.add_stage_time(name, time.perf_counter() - start, depth)
+                self.pass_on(item, outbox)
+        finally:
+            if outbox is not None:
+                outbox.put(STAGE_DONE)
+    
+    def fail_stage(self, name: str, error: BaseException):
+        """Stop the tracker after a stage error; run() re-raises the first one"""
+        print(f"Error in {name} stage: {error!r}")
+        if self.stage_error is None:
+            self.stage_error = error
+        self.stop_event.set()
+    
+    def display_stage(self, inbox: queue.Queue, outbox: queue.Queue):
+        """Show annotated frames and handle keys; HighGUI needs this on the main thread"""
+        failed = False
+        while True:
             try:
-                display_frame = self.frame_queue.get(timeout=0.1)
-                frame_count += 1
-            except queue.Empty:
-                if self.stop_event.is_set():
+                depth = inbox.qsize()
+                try:
+                    item = inbox.get(timeout=0.05)
+                except queue.Empty:
+                    # Keep the windows responsive while the stages upstream are busy
+                    self.handle_key(cv2.waitKey(1) & 0xFF)
+                    continue
+                if item is STAGE_DONE:
                     break
-                continue
-            
-            frame_time = time.time()
-            
-            # Process frame according to skip rate
-            if frame_count % self.config.frame_skip_rate == 0 and not self.paused:
-                process_start = time.time()
-                latest_results = self.process_frame(display_frame)
-                process_time = time.time() - process_start
-                self.perf_monitor.update(frame_time, process_time)
-            else:
-                self.perf_monitor.update(frame_time)
-            
-            # Draw detections
-            object_count = 0
-            if latest_results is not None:
-                object_count = self.draw_detections(display_frame, latest_results)
-            
-            # Draw UI elements
-            self.draw_stats(display_frame, object_count)
-            self.draw_controls(display_frame)
-            
-            if self.paused:
-                cv2.putText(display_frame, "PAUSED", (display_frame.shape[1]//2 - 50, 50),
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3)
-            
-            # Record frame if enabled
-            if recording and self.video_writer is not None:
-                self.video_writer.write(display_frame)
-            
-            # Display frame
-            cv2.imshow("YOLOv8 Object Tracker", display_frame)
-            
-            # Handle keyboard input
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                print("Quitting...")
+                if not failed:
+                    stream, _, frame, _ = item
+                    start = time.perf_counter()
+                    try:
+                        cv2.imshow(stream.window_name, frame)
+                        self.handle_key(cv2.waitKey(1) & 0xFF)
+                    except Exception as e:
+                        # Keep passing frames on so the stages either side can finish
+                        self.fail_stage("display", e)
+                        failed = True
+                    else:
+                        self.perf_monitor.add_stage_time("display", time.perf_counter() - start, depth)
+                outbox.put(item)
+            except KeyboardInterrupt:
+                print("Interrupted.")
                 self.stop_event.set()
-            elif key == ord('p'):
-                self.paused = not self.paused
-                print(f"{'Paused' if self.paused else 'Resumed'}")
-            elif key == ord('t'):
-                self.show_tracks = not self.show_tracks
-                print(f"Tracks {'enabled' if self.show_tracks else 'disabled'}")
-            elif key == ord('s'):
-                self.show_stats = not self.show_stats
-                print(f"Stats {'enabled' if self.show_stats else 'disabled'}")
-            elif key == ord('r'):
-                if not recording:
-                    self.start_recording(display_frame.shape)
-                    recording = True
-                else:
-                    self.stop_recording()
-                    recording = False
-            elif key == ord('d'):
-                self.save_detections()
+        outbox.put(STAGE_DONE)
+    
+    def run_pipeline(self, batched: bool):
+        """Run inference, annotation, display and recording as concurrent stages joined by bounded queues.
         
-        # Cleanup
+        Capture already runs in one reader thread per stream. Each stage works on
+        its own frame, so throughput is set by the slowest stage rather than their
+        sum. Headless runs skip the display stage. A stage error stops every stage
+        and is kept in stage_error for run() to raise after cleanup.
+        """
+        size = self.config.stage_queue_size
+        annotate, display, record = (queue.Queue(maxsize=size) for _ in PIPELINE_STAGES)
+        threads = [
+            threading.Thread(target=self.tracking_loop, args=(batched, annotate), daemon=True),
+            threading.Thread(target=self.run_stage, daemon=True,
+                             args=("annotate", self.annotate_frame, annotate, record if self.config.headless else display)),
+            threading.Thread(target=self.run_stage, args=("record", self.record_frame, record, None), daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+        
+        if not self.config.headless:
+            self.display_stage(display, record)
+        for thread in threads:
+            while thread.is_alive():
+                try:
+                    thread.join(0.1)
+                except KeyboardInterrupt:
+                    print("Interrupted.")
+                    self.stop_event.set()
+    
+    def expand_sources(self) -> List[Union[int, str]]:
+        """Replace directories in the configured sources with the video files they contain"""
+        sources = []
+        for source in self.config.sources:
+            if isinstance(source, str) and os.path.isdir(source):
+                sources.extend(sorted(
+                    os.path.join(source, name) for name in os.listdir(source)
+                    if name.lower().endswith(VIDEO_EXTENSIONS)
+                ))
+            else:
+                sources.append(source)
+        return sources
+    
+    def release_resources(self):
+        """Stop every thread and process and close all outputs; safe after a partial start"""
         print("Cleaning up...")
         self.stop_event.set()
+        if self.workers is not None:
+            self.workers.close()
         
-        if recording:
-            self.stop_recording()
+        self.stop_recording()
         
-        if thread and thread.is_alive():
-            thread.join(timeout=2)
+        for stream in self.streams:
+            if stream.thread and stream.thread.is_alive():
+                stream.thread.join(timeout=2)
         
-        cv2.destroyAllWindows()
+        if not self.config.headless:
+            cv2.destroyAllWindows()
+        for sink in [self.sink] + [s.sink for s in self.streams]:
+            if sink is not None:
+                sink.close()
         
         # Save final statistics
-        if self.config.save_detections and self.detections_log:
-            self.save_detections()
+        if self.detection_writer is not None:
+            self.detection_writer.close({'summary': self.detection_summary()})
+            files = self.detection_writer.files
+            print(f"Saved {self.detection_writer.written} detection records to {len(files)} file(s) "
+                  f"starting at {files[0] if files else self.config.output_dir}")
+    
+    def run(self):
+        """Main tracking loop"""
+        sources = self.expand_sources()
+        if self.config.offline and not sources:
+            raise SystemExit(f"Offline mode found no video files in: {', '.join(map(str, self.config.sources)) or '(none given)'}")
         
+        self.start_time = time.time()
+        try:
+            if self.config.offline:
+                os.makedirs(self.config.output_dir, exist_ok=True)
+                # Every frame is annotated into the per-file output video
+                self.recording = True
+                # Each file holds a ring of decode_ahead frames, so only a few are open at once
+                self.pending_sources.extend(sources)
+                while self.pending_sources and len(self.active_streams) < max(self.config.max_concurrent, 1):
+                    self.start_stream(self.pending_sources.popleft())
+            elif sources:
+                for source in sources:
+                    self.start_stream(source)
+            elif not self.open_default_camera():
+                return
+            
+            # Started once the sources are open; readers fill their rings while the models load
+            if self.config.inference_workers > 0:
+                capacity = 2 * self.config.inference_workers
+                self.workers = InferenceProcessPool(self.config, self.device, self.config.inference_workers, capacity)
+                self.class_names = self.workers.names
+            
+            self.start_time = time.time()
+            self.perf_monitor = PerformanceMonitor(window_size=30 * len(self.active_streams))
+            # model.track keeps a single tracker, so several sources always go through process_batch
+            batched = self.config.batch_size > 1 or len(sources) > 1
+            
+            if self.config.headless:
+                print("Running headless. Press Ctrl+C to stop.")
+            else:
+                for stream in self.streams:
+                    cv2.namedWindow(stream.window_name, cv2.WINDOW_NORMAL)
+                print("Controls: Q=Quit, P=Pause, T=Tracks, S=Stats, R=Record, D=Save Detections")
+            
+            self.run_pipeline(batched)
+            
+            if self.workers is not None:
+                # Let in-flight detections land in the logs before shutting the workers down
+                deadline = time.time() + 5
+                try:
+                    while self.stage_error is None and self.workers.in_flight and time.time() < deadline:
+                        self.apply_worker_results(0.1)
+                except RuntimeError as e:
+                    self.stage_error = e
+        finally:
+            self.release_resources()
+        
+        elapsed = time.time() - self.start_time
+        frames = sum(s.frame_count for s in self.streams)
         print(f"\nFinal Statistics:")
         print(f"Total Detections: {self.total_detections}")
         print(f"Object Counts: {dict(self.object_counts)}")
+        if len(self.streams) > 1:
+            for stream in self.streams:
+                print(f"Stream {stream.stream_id} ({stream.source}): {stream.frame_count} frames, "
+                      f"{stream.total_detections} detections, {dict(stream.object_counts)}")
+        overlays = self.perf_monitor.overlay_breakdown()
+        if overlays:
+            print("Overlay Draw Times: " + ", ".join(f"{name} {ms:.2f}ms" for name, ms in overlays.items()))
+        stages = self.perf_monitor.stage_breakdown()
+        if stages:
+            print("Pipeline Stages: " + ", ".join(f"{name} {ms:.2f}ms (queue {depth:.1f})"
+                                                  for name, (ms, depth) in stages.items()))
+        if self.frame_skip is not None:
+            print(f"Adaptive Frame Skip: detecting every {self.frame_skip.rate} frames "
+                  f"after {self.frame_skip.changes} adjustments")
+            if self.frame_skip.decisions:
+                print(f"Last Frame Skip Decision: {self.frame_skip.decisions[-1][2]}")
+        dropped = sum(s.frames.dropped for s in self.streams)
+        if dropped:
+            print(f"Dropped Frames: {dropped} (reader ahead of processing)")
+        print(f"Throughput: {frames} frames in {elapsed:.1f}s ({frames / elapsed if elapsed > 0 else 0:.1f} FPS)")
+        if self.config.offline and elapsed > 0:
+            # Streams are processed concurrently, so compare against the summed source duration
+            duration = sum(s.frame_count / s.fps for s in self.streams)
+            print(f"Processed {duration:.1f}s of video in {elapsed:.1f}s ({duration / elapsed:.2f}x real time)")
+            print(f"Annotated videos and detections written to {os.path.abspath(self.config.output_dir)}")
         print("Resources released.")
+        if self.stage_error is not None:
+            raise self.stage_error
+
+def parse_source(source: str) -> Union[int, str]:
+    """Device indices are given as plain integers, anything else is a URL or file path"""
+    return int(source) if source.isdigit() else source
 
 def main():
+    parser = argparse.ArgumentParser(description="YOLOv8 object tracker for one or more video sources.")
+    parser.add_argument("sources", nargs="*", type=parse_source,
+                        help="camera indices, RTSP URLs or video files (default: probe the built-in camera)")
+    parser.add_argument("--batch-size", type=int, default=1, help="frames per model call")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="run detection in this many worker processes fed through shared memory")
+    parser.add_argument("--adaptive-skip", action="store_true",
+                        help="adjust how often detection runs to meet --target-fps and --max-staleness")
+    parser.add_argument("--target-fps", type=float, default=30.0, help="per-stream frame rate for --adaptive-skip")
+    parser.add_argument("--max-staleness", type=float, default=0.25,
+                        help="seconds drawn detections may lag the frame, for --adaptive-skip")
+    parser.add_argument("--headless", action="store_true", help="no display or overlays, for servers")
+    parser.add_argument("--sink", metavar="FILE", help="write per-frame detections as JSON Lines to FILE ('-' for stdout)")
+    parser.add_argument("--record", action="store_true", help="record annotated video from the start")
+    parser.add_argument("--save-detections", action="store_true",
+                        help="stream detections to rotating JSON Lines files in --output-dir")
+    parser.add_argument("--offline", action="store_true",
+                        help="process video files or directories of them without dropping frames")
+    parser.add_argument("--max-concurrent", type=int, default=2,
+                        help="video files decoded at the same time in offline mode")
+    parser.add_argument("--output-dir", default=".", help="where annotated offline videos and detection logs are written")
+    args = parser.parse_args()
+    
     # Create configuration
     config = TrackerConfig(
         model_name="yolov8s.pt",
         conf_thresh=0.50,
         iou_thresh=0.50,
         frame_skip_rate=2,
+        adaptive_skip=args.adaptive_skip,
+        target_fps=args.target_fps,
+        max_staleness=args.max_staleness,
         max_queue_size=5,
         video_size=(640, 480),
         max_tracks_history=30,
-        enable_recording=False,
-        save_detections=False
+        enable_recording=args.record,
+        save_detections=args.save_detections,
+        batch_size=args.batch_size,
+        batch_max_wait=0.02,
+        sources=args.sources,
+        headless=args.headless,
+        sink_path=args.sink,
+        offline=args.offline,
+        max_concurrent=args.max_concurrent,
+        output_dir=args.output_dir,
+        inference_workers=args.workers
     )
     
     # Create and run tracker
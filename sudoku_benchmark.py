@@ -0,0 +1,232 @@
+import argparse
+import ast
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from multiprocessing import Pool, TimeoutError
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from Sudokuv2 import STRATEGIES, BulkSudokuSolver, format_board, np, parse_puzzle, solve_board
+
+# Puzzle tiers, all with unique solutions. Easy puzzles fall to naked/hidden
+# singles, hard ones are from Norvig's top95 set, and the hardest tier is the
+# usual "world's hardest" collection (Inkala, Platinum Blonde, Golden Nugget,
+# Easter Monster).
+TIERS = {
+    "easy": [
+        "003020600900305001001806400008102900700000008006708200002609500800203009005010300",
+        "200080300060070084030500209000105408000000000402706000301007040720040060004010003",
+        "030050040008010500460000012070502080000603000040109030250000098001020600080060020",
+        "780400120600075009000601078007040260001050930904060005070300012120007400049206007",
+    ],
+    "medium": [
+        "000000907000420180000705026100904000050000040000507009920108000034059000507000000",
+        "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+    ],
+    "hard": [
+        "400000805030000000000700000020000060000080400000010000000603070500200000104000000",
+        "520006000000000701300000000000400800600000050000000000041800000000030020008700000",
+        "600000803040700000000000000000504070300200000106000000020000050000080600000010000",
+        "480300000000000071020000000705000060000200800000000000001076000300000400000050000",
+        "000014000030000200070000000000900030601000000000000080200000104000050600000708000",
+    ],
+    "hardest": [
+        "800000000003600000070090200050007000000045700000100030001000068008500010090000400",
+        "000000012000000003002300400001800005060070800000009000008500000900040500470006000",
+        "000000039000001005003050800008090006070002000100400000009080050020000600400700000",
+        "100000002090400050006000700050903000000070000000850040700000600030009080002000001",
+    ],
+}
+
+def size_tier(box_size: int, count: int = 3, clue_fraction: float = 0.5, seed: int = 0):
+    """Deterministic puzzles for a (box_size^2)^2 board, for comparing sizes.
+
+    Each is a shuffled pattern grid with about clue_fraction of its cells
+    kept. Solutions are not necessarily unique.
+    """
+    rng = random.Random(seed)
+    k, n = box_size, box_size * box_size
+    puzzles = []
+    for _ in range(count):
+        rows = [band * k + r for band in rng.sample(range(k), k) for r in rng.sample(range(k), k)]
+        cols = [stack * k + c for stack in rng.sample(range(k), k) for c in rng.sample(range(k), k)]
+        digits = rng.sample(range(1, n + 1), n)
+        grid = [[digits[(k * (r % k) + r // k + c) % n] for c in cols] for r in rows]
+        puzzles.append(format_board([[num if rng.random() < clue_fraction else 0 for num in row] for row in grid]))
+    return puzzles
+
+SIZE_TIERS = {f"{k * k}x{k * k}": k for k in (3, 4, 5)}
+
+NOTEBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Sudoku.ipynb")
+
+def load_notebook_solver(path: str = NOTEBOOK):
+    """Pull the function definitions out of Sudoku.ipynb, skipping its demo cell."""
+    with open(path) as f:
+        notebook = json.load(f)
+    namespace = {}
+    for cell in notebook["cells"]:
+        if cell["cell_type"] != "code":
+            continue
+        tree = ast.parse("".join(cell["source"]))
+        tree.body = [node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.Import, ast.ImportFrom))]
+        exec(compile(tree, path, "exec"), namespace)
+    initialize_constraints = namespace["initialize_constraints"]
+    solve_with_constraints = namespace["solve_with_constraints"]
+
+    def solve(board):
+        return solve_with_constraints(board, *initialize_constraints(board))
+    return solve
+
+def available_strategies():
+    strategies = list(STRATEGIES) + ["notebook"]
+    if np is not None:
+        strategies.append("bulk")
+    return strategies
+
+def _solve_tier(strategy: str, puzzles, notebook=None):
+    """Solve every puzzle once, returning (solved, nodes, backtracks).
+
+    notebook is the solver from load_notebook_solver, loaded by the caller
+    so that parsing the notebook stays out of the timings.
+    """
+    boards = [parse_puzzle(p) for p in puzzles]
+    if strategy == "bulk":
+        bulk = BulkSudokuSolver(boards)
+        return int(bulk.solve().sum()), None, None
+    if strategy == "notebook":
+        return sum(bool(notebook(board)) for board in boards), None, None
+
+    solved = nodes = backtracks = 0
+    for board in boards:
+        solver = solve_board(board, strategy)
+        solved += solver.solved
+        nodes += solver.nodes
+        backtracks += solver.backtracks
+    return solved, nodes, backtracks
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform == "darwin" else peak  # bytes on macOS, KB elsewhere
+
+def run_tier(strategy: str, tier: str, puzzles, repeat: int = 1, trace_memory: bool = False) -> dict:
+    notebook = load_notebook_solver() if strategy == "notebook" else None
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        solved, nodes, backtracks = _solve_tier(strategy, puzzles, notebook)
+        times.append(time.perf_counter() - start)
+
+    wall_time = min(times)
+    result = {
+        "strategy": strategy,
+        "tier": tier,
+        "puzzles": len(puzzles),
+        "solved": solved,
+        "wall_time": wall_time,
+        "mean_time": wall_time / len(puzzles),
+        "nodes": nodes,
+        "backtracks": backtracks,
+        # Each pair runs in a fresh worker, so this is the peak for this pair
+        "peak_rss_kb": peak_rss_kb(),
+    }
+    if trace_memory:
+        # A separate pass: tracemalloc slows integer-heavy searches by an
+        # order of magnitude, which would distort the timings.
+        tracemalloc.start()
+        _solve_tier(strategy, puzzles, notebook)
+        result["peak_memory_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return result
+
+def run_benchmark(strategies, tiers, timeout: float = 60.0, repeat: int = 1, trace_memory: bool = False):
+    """Run each (strategy, tier) pair in a fresh worker process.
+
+    tiers maps tier names to puzzle strings. A pair that exceeds timeout
+    seconds is killed and reported with "timeout": True, so one exploding
+    search cannot stall the whole run.
+    """
+    results = []
+    for strategy in strategies:
+        for tier, puzzles in tiers.items():
+            if strategy == "bulk" and any(len(p) != 81 for p in puzzles):
+                continue  # the bulk solver only handles 9x9 boards
+            pool = Pool(1)
+            try:
+                job = pool.apply_async(run_tier, (strategy, tier, puzzles, repeat, trace_memory))
+                result = job.get(timeout)
+                pool.close()
+            except TimeoutError:
+                result = {"strategy": strategy, "tier": tier, "puzzles": len(puzzles), "timeout": True}
+            finally:
+                pool.terminate()
+                pool.join()
+            results.append(result)
+            print(format_result(result), file=sys.stderr)
+    return results
+
+def format_result(result: dict) -> str:
+    name = f"{result['strategy']:<9} {result['tier']:<8}"
+    if result.get("timeout"):
+        return f"{name} timed out"
+    nodes = result["nodes"] if result["nodes"] is not None else "-"
+    backtracks = result["backtracks"] if result["backtracks"] is not None else "-"
+    line = (f"{name} {result['solved']}/{result['puzzles']} solved  "
+            f"{result['wall_time'] * 1000:9.1f}ms  nodes {nodes:>9}  backtracks {backtracks:>9}")
+    if result["peak_rss_kb"] is not None:
+        line += f"  peak RSS {result['peak_rss_kb'] / 1024:6.1f}MB"
+    if "peak_memory_kb" in result:
+        line += f"  traced {result['peak_memory_kb']:8.1f}KB"
+    return line
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Sudoku solver strategies on standard puzzle tiers.")
+    parser.add_argument("--strategies", nargs="+", choices=available_strategies(), default=available_strategies())
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=list(TIERS))
+    parser.add_argument("--sizes", nargs="*", choices=list(SIZE_TIERS), default=None,
+                        help="compare board sizes on generated puzzles instead of the standard tiers")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per strategy and tier")
+    parser.add_argument("--repeat", type=int, default=1, help="timing passes per tier; the fastest is reported")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also report the tracemalloc peak from an extra, much slower pass")
+    parser.add_argument("--json", metavar="FILE", help="write results as JSON for regression tracking")
+    args = parser.parse_args()
+
+    if args.sizes is not None:
+        tiers = {name: size_tier(SIZE_TIERS[name]) for name in args.sizes or SIZE_TIERS}
+    else:
+        tiers = {name: TIERS[name] for name in args.tiers}
+    results = run_benchmark(args.strategies, tiers, args.timeout, args.repeat, args.trace_memory)
+    if args.json:
+        report = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote results to {args.json}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
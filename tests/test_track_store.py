@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+person = pytest.importorskip("person", reason="person.py needs cv2, torch and ultralytics")
+TrackStore = person.TrackStore
+
+def centers(*points):
+    return np.array(points, dtype=np.int32)
+
+def test_known_ids_keep_history_when_a_new_id_evicts():
+    """A new ID listed before a known one in a full store evicts another track"""
+    store = TrackStore(capacity=2, history=4, ttl=100)
+    store.update(np.array([1, 2]), centers([1, 1], [2, 2]))
+    store.update(np.array([2]), centers([3, 3]))
+    # Track 1 is the least recently seen, but it is in this frame, so track 2 is evicted
+    store.update(np.array([3, 1]), centers([9, 9], [4, 4]))
+    assert sorted(store.slot_of) == [1, 3]
+    assert store.track(1).tolist() == [[1, 1], [4, 4]]
+    assert store.track(3).tolist() == [[9, 9]]
+    assert store.evicted == 1
+
+def test_track_keeps_the_newest_history_points_in_order():
+    store = TrackStore(capacity=1, history=3, ttl=100)
+    for step in range(5):
+        store.update(np.array([7]), centers([step, -step]))
+    assert store.track(7).tolist() == [[2, -2], [3, -3], [4, -4]]
+
+def test_unseen_tracks_expire_after_ttl():
+    store = TrackStore(capacity=4, history=4, ttl=2)
+    store.update(np.array([1, 2]), centers([1, 1], [2, 2]))
+    store.update(np.array([2]), centers([2, 3]))
+    assert 1 in store.slot_of
+    store.update(np.array([2]), centers([2, 4]))
+    assert sorted(store.slot_of) == [2]
+    assert len(store.track(1)) == 0
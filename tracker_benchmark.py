@@ -0,0 +1,93 @@
+import argparse
+import statistics
+import timeit
+
+import numpy as np
+
+from person import Detections, ObjectTracker, StreamState, TrackerConfig
+
+def seeded_color(track_id: int):
+    """The old get_color_for_track, which reseeded the global RNG on every call"""
+    if track_id == -1:
+        return (0, 255, 0)
+    np.random.seed(track_id)
+    return tuple(np.random.randint(0, 255, 3).tolist())
+
+def synthetic_detections(count: int, frame_shape, seed: int = 0) -> Detections:
+    """count tracked boxes scattered over a frame"""
+    rng = np.random.default_rng(seed)
+    h, w = frame_shape[:2]
+    x1 = rng.integers(0, w - 80, count)
+    y1 = rng.integers(20, h - 80, count)
+    boxes = np.stack([x1, y1, x1 + rng.integers(20, 80, count), y1 + rng.integers(20, 80, count)], axis=1)
+    return Detections(boxes.astype(np.int32), rng.random(count).astype(np.float32),
+                      np.zeros(count, dtype=np.int32), np.arange(1, count + 1, dtype=np.int32))
+
+def make_stream(boxes: int, history: int, frame_shape):
+    """A stream with the latest detections and full track histories"""
+    config = TrackerConfig(max_tracks_history=history)
+    stream = StreamState(0, 0, 0, config)
+    detections = synthetic_detections(boxes, frame_shape)
+    stream.latest_detections = detections
+    centers = (detections.boxes[:, :2] + detections.boxes[:, 2:]) // 2
+    for step in range(history):
+        stream.tracks.update(detections.ids, centers + [step, 0])
+    return config, stream
+
+def make_tracker(config: TrackerConfig, color=None) -> ObjectTracker:
+    """A tracker that only draws; color replaces the palette lookup"""
+    tracker = ObjectTracker(config, load_model=False)
+    tracker.class_names = {0: "person"}
+    if color is not None:
+        tracker.get_color_for_track = color
+    return tracker
+
+def compare(variants, number: int, rounds: int, warmup: int):
+    """Seconds per call of each variant as (min, median) over rounds.
+
+    Every variant is warmed up first, and rounds alternate the order the
+    variants run in so neither always goes first.
+    """
+    timers = {name: timeit.Timer(func) for name, func in variants.items()}
+    for timer in timers.values():
+        timer.timeit(warmup)
+    times = {name: [] for name in timers}
+    names = list(timers)
+    for i in range(rounds):
+        for name in names if i % 2 == 0 else reversed(names):
+            times[name].append(timers[name].timeit(number) / number)
+    return {name: (min(samples), statistics.median(samples)) for name, samples in times.items()}
+
+def report(label: str, results, scale: float, unit: str):
+    (old_min, old_median), (new_min, new_median) = results["seeded"], results["palette"]
+    print(f"{label}: seeded min {old_min * scale:8.3f}{unit} median {old_median * scale:8.3f}{unit} | "
+          f"palette min {new_min * scale:8.3f}{unit} median {new_median * scale:8.3f}{unit} | "
+          f"{old_min / new_min:.1f}x faster (min), {old_median / new_median:.1f}x (median)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame cost of track colours and detection drawing, "
+                                                 "old seeded colours vs the palette lookup.")
+    parser.add_argument("--boxes", type=int, default=20, help="tracked boxes per frame")
+    parser.add_argument("--history", type=int, default=30, help="points per track polyline")
+    parser.add_argument("--frames", type=int, default=200, help="frames drawn per timing round")
+    parser.add_argument("--rounds", type=int, default=7, help="timing rounds per variant; min and median are reported")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed frames per variant before timing")
+    args = parser.parse_args()
+
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    config, stream = make_stream(args.boxes, args.history, frame.shape)
+    trackers = {"seeded": make_tracker(config, seeded_color), "palette": make_tracker(config)}
+    ids = stream.latest_detections.ids.tolist()
+
+    colors = compare({name: lambda t=tracker: [t.get_color_for_track(i) for i in ids]
+                      for name, tracker in trackers.items()}, args.frames, args.rounds, args.warmup)
+    # Per-ID time: each call looks up every box's colour
+    report("Colour lookup (per ID)", {name: (lo / len(ids), mid / len(ids)) for name, (lo, mid) in colors.items()},
+           1e6, "us")
+
+    draws = compare({name: lambda t=tracker: t.draw_detections(frame, stream)
+                     for name, tracker in trackers.items()}, args.frames, args.rounds, args.warmup)
+    report(f"draw_detections ({args.boxes} boxes)", draws, 1e3, "ms")
+
+if __name__ == "__main__":
+    main()